@@ -3,6 +3,7 @@ from flask import Flask
 from .db import db
 from babel.dates import format_date
 import os
+import click
 from .routes.orders import orders_bp
 from .routes.finance import finance_bp
 
@@ -17,7 +18,7 @@ def create_app():
         db.init_app(app)
     
     # === REGISTRO DE FILTROS (Jinja2) ===
-    from .utils import parse_date, format_currency, parse_float
+    from .utils import parse_date, format_currency
     
     @app.template_filter("format_brl")
     def format_brl(value):
@@ -35,6 +36,20 @@ def create_app():
         except Exception:
             return value
 
+    # === COMANDOS CLI ===
+    # Ex (cron): flask --app run reconciliar
+    @app.cli.command("reconciliar")
+    @click.option("--forcar", is_flag=True, help="Refaz a baixa mesmo de clientes sem alteração.")
+    def reconciliar_cmd(forcar):
+        """Baixa FIFO de pagamentos para todos os clientes, numa única gravação."""
+        from .services.finance import reconciliar_todos
+        r = reconciliar_todos(forcar=forcar)
+        status = "✅" if r["gravado"] else "❌"
+        click.echo(f"{status} {r['clientes']} clientes, {r['reconciliados']} reconciliados, "
+                   f"{r['celulas_alteradas']} células de PAGO alteradas.")
+        if not r["gravado"]:
+            raise SystemExit(1)
+
     # === REGISTRO DE BLUEPRINTS ===
     from .routes.auth import auth_bp
     from .routes.dashboard import dashboard_bp
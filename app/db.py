@@ -1,19 +1,154 @@
 # app/db.py
+import hashlib
 import os
+import time
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import gspread
+from gspread.utils import a1_to_rowcol, absolute_range_name, column_letter_to_index, fill_gaps, numericise_all, rowcol_to_a1, to_records
 from google.oauth2.service_account import Credentials
+from .rate_limit import ApiLimiter, ThrottledHTTPClient
+from .sheet_watcher import SheetWatcher
 
 # Escopos necessários para acessar planilhas e drive
 SCOPES = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
 
+# Tempo de vida (segundos) do cache de leitura de cada aba.
+# Abas transacionais expiram rápido; cadastros quase não mudam.
+# Pode ser sobrescrito por app.config["SHEETS_CACHE_TTL"] = {"pedidos": 10, ...}
+# ou globalmente pela variável de ambiente SHEETS_CACHE_TTL (0 desliga o cache).
+DEFAULT_CACHE_TTL = {
+    'pedidos': 30,
+    'itens': 30,
+    'custos': 30,
+    'status': 30,
+    'pagamentos': 30,
+    'usuarios': 300,
+    'clientes': 300,
+    'produtos': 300,
+    'cad_status': 600,
+}
+
+# A aba PEDIDOS tem colunas calculadas a partir das abas de detalhe
+# (STATUS vem do histórico, VLR_PED soma os itens). Escrever nelas deixa PEDIDOS velho também.
+DEPENDENT_SHEETS = {
+    'itens': ('pedidos',),
+    'custos': ('pedidos',),
+    'status': ('pedidos',),
+}
+
+# Leituras independentes (abas / planilhas diferentes) rodam em paralelo neste número de threads
+FETCH_MAX_WORKERS = 4
+
+# Abas usadas pelo app: nome lógico -> (planilha, título da worksheet)
+WORKSHEETS = {
+    # Planilha Principal (PEDIDOS)
+    'pedidos': ('PEDIDOS', "PEDIDOS"),
+    'itens': ('PEDIDOS', "PEDIDOS_ITENS"),
+    'custos': ('PEDIDOS', "PEDIDOS_CUSTOS"),
+    'status': ('PEDIDOS', "PEDIDOS_STATUS"),
+    'pagamentos': ('PEDIDOS', "PEDIDOS_PGTOS"),
+    # Planilha Secundária (CADASTROS)
+    'usuarios': ('CADASTROS', "ADM_BOT"),
+    'clientes': ('CADASTROS', "CLIENTES"),
+    'produtos': ('CADASTROS', "PRODUTOS"),
+    'cad_status': ('CADASTROS', "STATUS"),
+}
+
+class LazyWorksheets(Mapping):
+    """
+    Dicionário de worksheets que só abre a planilha no primeiro acesso a uma de suas abas.
+    db.sheets['pedidos'] continua funcionando como antes.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        ws = self._loaded.get(name)
+        if ws is None:
+            if name not in WORKSHEETS:
+                raise KeyError(name)
+            self._db._open_spreadsheet(WORKSHEETS[name][0])
+            ws = self._loaded[name]
+        return ws
+
+    def __contains__(self, name):
+        return name in WORKSHEETS
+
+    def __iter__(self):
+        return iter(WORKSHEETS)
+
+    def __len__(self):
+        return len(WORKSHEETS)
+
+    def loaded(self):
+        """Somente as worksheets já abertas (não dispara acesso à rede)."""
+        return dict(self._loaded)
+
 class SheetsDB:
     def __init__(self):
         self.client = None
-        self.sheets = {}
+        self.limiter = None
+        self.watcher = None
+        self.sheets = LazyWorksheets(self)
+        self.spreadsheets = {}
+        self._open_locks = {alias: threading.Lock() for alias, _ in WORKSHEETS.values()}
+
+        # Cache de leitura: nome da aba -> (timestamp, valores brutos, registros)
+        self.cache_ttl = dict(DEFAULT_CACHE_TTL)
+        self._cache = {}
+        self._versions = {}
+        self._generations = {}
+        # Impressão digital do último conteúdo baixado de cada aba (e de cada projeção)
+        self._fingerprints = {}
+        self._projection_generations = {}
+        # Expirações por mudança fora do app (SheetWatcher): downloads iniciados antes não são guardados
+        self._expirations = {}
+        self._cache_lock = threading.Lock()
+        self._fetch_locks = {}
+
+        # Leituras projetadas (só algumas colunas): nome -> {colunas: (timestamp, valores)}
+        self._projections = {}
+        # Cabeçalho de cada aba e colunas já resolvidas: (nome, especificação) -> números das colunas
+        self._headers = {}
+        self._resolved_columns = {}
+
+        # Estruturas derivadas (índices, resumos) avisadas a cada escrita feita pelo app
+        self._listeners = []
+
+        # Pool para leituras em paralelo (criado no primeiro uso)
+        self.fetch_workers = FETCH_MAX_WORKERS
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._pool_local = threading.local()
         
     def init_app(self, app):
         """Inicializa conexão ao rodar o app, detectando ambiente (Local ou Cloud Run)"""
         
+        self._configure_cache(app)
+
+        # IDs das planilhas
+        self.SHEET_ID_PEDIDOS = "1RbzDCYh7xaVmOxD1JLWDfpiw9HKhtw4r2zKxcmCfFsE"
+        self.SHEET_ID_CADASTROS = "1QDP8Uo71gL_T9efOqtmSc5AoBTnYA8DlpgzYbTVIhoY"
+
+        self.spreadsheet_ids = {
+            'PEDIDOS': self.SHEET_ID_PEDIDOS,
+            'CADASTROS': self.SHEET_ID_CADASTROS,
+        }
+
+        # --- BACKEND LOCAL (testes/benchmark sem rede) ---
+        if os.environ.get("SHEETS_BACKEND", "").strip().lower() == "fake":
+            from .fake_sheets import FakeClient
+            self.client = FakeClient.from_env()
+            print(f"🧪 [DB] Backend local ativado. Fixtures: {self.client.fixtures_dir}")
+            self._start_warm_up()
+            self._start_watcher()
+            return
+
         # --- LÓGICA DE CREDENCIAIS HÍBRIDA ---
         # 1. Caminho no Cloud Run (Volume montado em /app/secrets)
         cloud_secret_path = "/app/secrets/credentials.json"
@@ -27,34 +162,21 @@ class SheetsDB:
             cred_path = local_path
             print(f"🏠 [DB] Ambiente Local detectado. Usando: {cred_path}")
         
-        # IDs das planilhas
-        self.SHEET_ID_PEDIDOS = "1RbzDCYh7xaVmOxD1JLWDfpiw9HKhtw4r2zKxcmCfFsE"
-        self.SHEET_ID_CADASTROS = "1QDP8Uo71gL_T9efOqtmSc5AoBTnYA8DlpgzYbTVIhoY"
-        
         try:
             # Autenticação
+            t0 = time.perf_counter()
             creds = Credentials.from_service_account_file(cred_path, scopes=SCOPES)
-            self.client = gspread.authorize(creds)
+            # Toda chamada à API passa pelo limitador de cota (token bucket + backoff em 429/5xx)
+            self.limiter = ApiLimiter.from_env()
+            self.client = gspread.authorize(creds, http_client=partial(ThrottledHTTPClient, limiter=self.limiter))
+            print(f"⏱️ [DB] Autenticação: {(time.perf_counter() - t0) * 1000:.0f} ms")
             
-            # --- MAPEAMENTO DAS ABAS (WORKSHEETS) ---
-            print("🔄 [DB] Conectando às planilhas...")
-            
-            # Planilha Principal (PEDIDOS)
-            sheet_pedidos = self.client.open_by_key(self.SHEET_ID_PEDIDOS)
-            self.sheets['pedidos'] = sheet_pedidos.worksheet("PEDIDOS")
-            self.sheets['itens'] = sheet_pedidos.worksheet("PEDIDOS_ITENS")
-            self.sheets['custos'] = sheet_pedidos.worksheet("PEDIDOS_CUSTOS")
-            self.sheets['status'] = sheet_pedidos.worksheet("PEDIDOS_STATUS")
-            self.sheets['pagamentos'] = sheet_pedidos.worksheet("PEDIDOS_PGTOS")
-
-            # Planilha Secundária (CADASTROS)
-            sheet_cadastros = self.client.open_by_key(self.SHEET_ID_CADASTROS)
-            self.sheets['usuarios'] = sheet_cadastros.worksheet("ADM_BOT")
-            self.sheets['clientes'] = sheet_cadastros.worksheet("CLIENTES")
-            self.sheets['produtos'] = sheet_cadastros.worksheet("PRODUTOS")
-            self.sheets['cad_status'] = sheet_cadastros.worksheet("STATUS")
+            # As planilhas são abertas sob demanda (ou pelo warm-up), sem travar o boot
+            self._start_warm_up()
+            # Edições feitas direto no Sheets (ou pelo bot) chegam ao cache em segundos
+            self._start_watcher()
             
-            print("✅ [DB] Conexão com Google Sheets estabelecida com sucesso!")
+            print("✅ [DB] Cliente do Google Sheets pronto. Abas serão abertas no primeiro acesso.")
             
         except FileNotFoundError:
             print(f"❌ [DB] ERRO FATAL: Arquivo de credenciais não encontrado em: {cred_path}")
@@ -64,6 +186,74 @@ class SheetsDB:
             print(f"❌ [DB] Erro ao conectar no Google Sheets: {e}")
             raise e
 
+    def _open_spreadsheet(self, alias):
+        """
+        Abre uma planilha ('PEDIDOS' / 'CADASTROS') e resolve todas as suas abas
+        com uma única listagem (em vez de uma chamada por worksheet).
+        """
+        with self._open_locks[alias]:
+            if alias in self.spreadsheets:
+                return self.spreadsheets[alias]
+
+            # --- MAPEAMENTO DAS ABAS (WORKSHEETS) ---
+            print(f"🔄 [DB] Conectando à planilha {alias}...")
+            t0 = time.perf_counter()
+            spreadsheet = self.client.open_by_key(self.spreadsheet_ids[alias])
+            t1 = time.perf_counter()
+            por_titulo = {ws.title: ws for ws in spreadsheet.worksheets()}
+            for name, (sheet_alias, title) in WORKSHEETS.items():
+                if sheet_alias == alias:
+                    # Fallback para worksheet(): levanta WorksheetNotFound se a aba sumiu
+                    self.sheets._loaded[name] = por_titulo.get(title) or spreadsheet.worksheet(title)
+            t2 = time.perf_counter()
+
+            self.spreadsheets[alias] = spreadsheet
+            print(f"⏱️ [DB] {alias}: abrir planilha {(t1 - t0) * 1000:.0f} ms | "
+                  f"localizar abas {(t2 - t1) * 1000:.0f} ms")
+            return spreadsheet
+
+    def warm_up(self):
+        """Abre todas as planilhas em paralelo (uma thread por planilha)."""
+        t0 = time.perf_counter()
+        aliases = sorted({alias for alias, _ in WORKSHEETS.values()})
+        with ThreadPoolExecutor(max_workers=len(aliases), thread_name_prefix="sheets-warmup") as pool:
+            list(pool.map(self._open_spreadsheet, aliases))
+        print(f"✅ [DB] Warm-up concluído em {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    def _start_warm_up(self):
+        """
+        SHEETS_WARMUP: 'background' (padrão) abre as planilhas em segundo plano sem
+        travar o boot; 'sync' espera terminar; 'off' deixa tudo para o primeiro acesso.
+        """
+        modo = os.environ.get("SHEETS_WARMUP", "background").strip().lower()
+        if modo in ("off", "0", "false", "no"):
+            return
+        if modo in ("sync", "1", "true"):
+            self.warm_up()
+            return
+
+        def _run():
+            try:
+                self.warm_up()
+            except Exception as e:
+                # Sem problema: cada aba volta a tentar abrir no primeiro acesso
+                print(f"⚠️ [DB] Warm-up falhou: {e}")
+
+        threading.Thread(target=_run, name="sheets-warmup", daemon=True).start()
+
+    def spreadsheet(self, alias):
+        """Planilha ('PEDIDOS' / 'CADASTROS'), aberta no primeiro acesso."""
+        return self.spreadsheets.get(alias) or self._open_spreadsheet(alias)
+
+    def tabs(self, alias):
+        """Nomes lógicos das abas de uma planilha."""
+        return [name for name, (sheet_alias, _) in WORKSHEETS.items() if sheet_alias == alias]
+
+    def _start_watcher(self):
+        """Verificação periódica do modifiedTime das planilhas (SHEETS_WATCH_INTERVAL; 0 desliga)."""
+        self.watcher = SheetWatcher.from_env(self)
+        self.watcher.start()
+
     def get_ws(self, name):
         """Retorna a worksheet já carregada pelo nome"""
         if name not in self.sheets:
@@ -71,5 +261,516 @@ class SheetsDB:
             return None
         return self.sheets.get(name)
 
+    # ==========================
+    # CACHE DE LEITURA (READ-THROUGH)
+    # ==========================
+
+    def _configure_cache(self, app):
+        """Aplica TTLs vindos da configuração do app / variável de ambiente."""
+        ttl_global = os.environ.get("SHEETS_CACHE_TTL")
+        if ttl_global is not None:
+            try:
+                segundos = float(ttl_global)
+                self.cache_ttl = {name: segundos for name in self.cache_ttl}
+            except ValueError:
+                print(f"⚠️ [DB] SHEETS_CACHE_TTL inválido: {ttl_global!r}")
+        self.cache_ttl.update(app.config.get("SHEETS_CACHE_TTL", {}))
+
+        workers = os.environ.get("SHEETS_FETCH_WORKERS")
+        if workers:
+            try:
+                self.fetch_workers = max(int(workers), 1)
+            except ValueError:
+                print(f"⚠️ [DB] SHEETS_FETCH_WORKERS inválido: {workers!r}")
+
+    def sheet_name(self, ws_or_name):
+        """Aceita o nome lógico da aba ('pedidos') ou o próprio objeto Worksheet."""
+        if isinstance(ws_or_name, str):
+            return ws_or_name
+        loaded = self.sheets.loaded()
+        for name, ws in loaded.items():
+            if ws is ws_or_name:
+                return name
+        # O id da aba só é único dentro da mesma planilha
+        chave = (getattr(ws_or_name, "spreadsheet_id", None), getattr(ws_or_name, "id", None))
+        for name, ws in loaded.items():
+            if (getattr(ws, "spreadsheet_id", None), getattr(ws, "id", None)) == chave:
+                return name
+        return None
+
+    def _fetch_lock(self, name):
+        with self._cache_lock:
+            lock = self._fetch_locks.get(name)
+            if lock is None:
+                lock = self._fetch_locks[name] = threading.Lock()
+            return lock
+
+    def _fresh_entry(self, name):
+        """Entrada do cache ainda dentro do TTL, ou None."""
+        entry = self._cache.get(name)
+        if entry and time.monotonic() - entry[0] < self.cache_ttl.get(name, 0):
+            return entry
+        return None
+
+    def _store(self, name, version, values):
+        """Guarda valores recém-baixados e devolve (valores, registros)."""
+        records = self.to_records(values)
+        with self._cache_lock:
+            # Se houve escrita durante o download, o resultado já nasce velho: não guarda
+            if self._fetch_token(name) == version and self.cache_ttl.get(name, 0) > 0:
+                self._cache[name] = (time.monotonic(), values, records)
+                # Mesmo conteúdo baixado de novo não é "dado novo": a geração só muda se mudou algo
+                fingerprint = _fingerprint(values)
+                if self._fingerprints.get(name) != fingerprint:
+                    self._fingerprints[name] = fingerprint
+                    self._generations[name] = self._generations.get(name, 0) + 1
+        if values and values[0] != self._headers.get(name):
+            self._set_header(name, values[0])
+        return values, records
+
+    def _fetch_token(self, name):
+        """Muda a cada escrita do app e a cada mudança externa detectada: download que começou antes chega velho."""
+        return self._versions.get(name, 0), self._expirations.get(name, 0)
+
+    def _cached_entry(self, name):
+        """Retorna (valores, registros) da aba, buscando no Sheets só se o cache expirou."""
+        entry = self._fresh_entry(name)
+        if entry:
+            return entry[1], entry[2]
+
+        # Um único fetch por aba: as outras threads esperam e reaproveitam o resultado
+        with self._fetch_lock(name):
+            entry = self._fresh_entry(name)
+            if entry:
+                return entry[1], entry[2]
+
+            version = self._fetch_token(name)
+            return self._store(name, version, self.sheets[name].get_all_values())
+
+    @staticmethod
+    def to_records(values):
+        """Converte valores brutos em registros, igual ao Worksheet.get_all_records()."""
+        if not values or values == [[]]:
+            return []
+        return to_records(values[0], [numericise_all(row) for row in values[1:]])
+
+    def generation(self, name):
+        """Muda sempre que o cache da aba recebe do Sheets um conteúdo diferente do anterior."""
+        return self._generations.get(name, 0)
+
+    def data_version(self, names):
+        """
+        Token do estado das abas (escritas do app + conteúdo baixado), sem acessar a rede.
+        Enquanto o token não muda, leituras dessas abas devolvem os mesmos dados.
+        None se alguma aba não está no cache dentro do TTL (a próxima leitura irá ao Sheets).
+        """
+        token = []
+        agora = time.monotonic()
+        for name in names:
+            ttl = self.cache_ttl.get(name, 0)
+            projecoes = self._projections.get(name, {})
+            if not self._fresh_entry(name) and not any(agora - ts < ttl for ts, _ in list(projecoes.values())):
+                return None
+            token.append((
+                name,
+                self._versions.get(name, 0),
+                self._generations.get(name, 0),
+                self._projection_generations.get(name, 0),
+            ))
+        return tuple(token)
+
+    def cached_values(self, name):
+        """Valores da aba se estiverem no cache e dentro do TTL; None caso contrário (não acessa a rede)."""
+        entry = self._fresh_entry(name)
+        return entry[1] if entry else None
+
+    def get_values(self, name):
+        """Equivalente cacheado de get_all_values(). Não altere as linhas retornadas."""
+        values, _ = self._cached_entry(name)
+        return list(values)
+
+    def get_records(self, name):
+        """Equivalente cacheado de get_all_records(). Cada registro é uma cópia livre para edição."""
+        _, records = self._cached_entry(name)
+        return [dict(r) for r in records]
+
+    def snapshot(self, names):
+        """
+        Lê várias abas com uma única chamada values:batchGet por planilha e
+        devolve {nome: registros}. Abas ainda válidas no cache não são baixadas.
+        Os registros seguem o mesmo formato de get_records().
+        """
+        return {name: [dict(r) for r in records] for name, (_, records) in self._snapshot_entries(names).items()}
+
+    def snapshot_values(self, names):
+        """
+        Como snapshot(), mas devolve {nome: valores brutos}. As listas são as
+        mesmas do cache (o mesmo objeto enquanto a aba não muda): não altere.
+        """
+        return {name: values for name, (values, _) in self._snapshot_entries(names).items()}
+
+    def _snapshot_entries(self, names):
+        names = list(dict.fromkeys(names))
+
+        # Agrupa as abas pendentes por planilha (PEDIDOS / CADASTROS)
+        pendentes = {}
+        for name in names:
+            if not self._fresh_entry(name):
+                ws = self.sheets[name]
+                pendentes.setdefault(ws.spreadsheet_id, []).append(name)
+
+        # Planilhas diferentes são baixadas ao mesmo tempo
+        baixados = {}
+        for parcial in self.run_parallel(*[
+            (lambda grupo=grupo: self._fetch_batch(sorted(grupo))) for grupo in pendentes.values()
+        ]):
+            baixados.update(parcial)
+
+        return {name: baixados[name] if name in baixados else self._cached_entry(name) for name in names}
+
+    def run_parallel(self, *calls):
+        """
+        Executa funções independentes (sem argumentos) no pool de leitura e
+        devolve os resultados na mesma ordem. Exceções são repassadas a quem chamou.
+        """
+        # Dentro de uma thread do pool roda em sequência: esperar o próprio pool pode travar
+        if len(calls) < 2 or getattr(self._pool_local, "worker", False):
+            return [call() for call in calls]
+        futures = [self._executor().submit(self._run_in_pool, call) for call in calls]
+        return [f.result() for f in futures]
+
+    def _run_in_pool(self, call):
+        self._pool_local.worker = True
+        try:
+            return call()
+        finally:
+            self._pool_local.worker = False
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="sheets-fetch")
+            return self._pool
+
+    def _fetch_batch(self, names):
+        """Baixa as abas de uma mesma planilha em um único request, popula o cache e devolve {nome: (valores, registros)}."""
+        # Locks sempre na mesma ordem (nomes ordenados) para não haver deadlock entre threads
+        locks = [self._fetch_lock(name) for name in names]
+        for lock in locks:
+            lock.acquire()
+        try:
+            names = [name for name in names if not self._fresh_entry(name)]
+            if not names:
+                return {}
+            versions = {name: self._fetch_token(name) for name in names}
+            spreadsheet = self.sheets[names[0]].spreadsheet
+            ranges = [absolute_range_name(self.sheets[name].title) for name in names]
+            response = spreadsheet.values_batch_get(ranges)
+            baixados = {}
+            for name, value_range in zip(names, response.get("valueRanges", [])):
+                values = fill_gaps(value_range.get("values", []))
+                baixados[name] = self._store(name, versions[name], values)
+            return baixados
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    # ==========================
+    # LEITURAS PROJETADAS (SÓ ALGUMAS COLUNAS)
+    # ==========================
+
+    def get_columns(self, name, columns):
+        """
+        Só as colunas pedidas da aba, na ordem pedida, com o cabeçalho na primeira linha.
+        'columns' aceita nomes do cabeçalho ('CLIENTE'), faixas A1 ('A:I', 'M:M') ou números (1 = A).
+        Ex: get_columns('pagamentos', ['A:D']) -> [[cabeçalho A..D], [linha 2 A..D], ...]
+        A lista é a mesma do cache enquanto a aba não muda: não altere.
+        """
+        return self.get_columns_many({name: columns})[name]
+
+    def get_columns_many(self, projections):
+        """
+        {nome: colunas} -> {nome: linhas projetadas}. As abas que precisam ir ao
+        Sheets são lidas num único values:batchGet por planilha.
+        """
+        cols_por_aba = {name: self.resolve_columns(name, columns) for name, columns in projections.items()}
+
+        result = {}
+        while cols_por_aba:
+            pendentes = {}
+            for name, cols in cols_por_aba.items():
+                values = self._cached_projection(name, cols)
+                if values is None:
+                    pendentes.setdefault(self.sheets[name].spreadsheet_id, []).append(name)
+                else:
+                    result[name] = values
+
+            mudaram = set()
+            for parcial, cabecalhos in self.run_parallel(*[
+                (lambda grupo=grupo: self._fetch_projection({n: cols_por_aba[n] for n in sorted(grupo)}))
+                for grupo in pendentes.values()
+            ]):
+                result.update(parcial)
+                mudaram |= cabecalhos
+
+            # Cabeçalho mudou: colunas pedidas por nome podem ter mudado de lugar
+            novas = {name: self.resolve_columns(name, projections[name]) for name in mudaram}
+            cols_por_aba = {name: cols for name, cols in novas.items() if cols != cols_por_aba[name]}
+        return {name: result[name] for name in projections}
+
+    def resolve_columns(self, name, columns):
+        """Especificação de colunas -> tupla de números de coluna (1-based). Nomes são resolvidos uma vez."""
+        spec = tuple(columns)
+        cols = self._resolved_columns.get((name, spec))
+        if cols is not None:
+            return cols
+        cols = []
+        for col in spec:
+            if isinstance(col, int):
+                cols.append(col)
+            elif ":" in col:
+                a, _, b = col.partition(":")
+                cols.extend(range(column_letter_to_index(a.strip()), column_letter_to_index(b.strip()) + 1))
+            else:
+                header = self.header(name)
+                if col not in header:
+                    raise KeyError(f"Coluna '{col}' não existe na aba '{name}'")
+                cols.append(header.index(col) + 1)
+        cols = tuple(cols)
+        with self._cache_lock:
+            self._resolved_columns[(name, spec)] = cols
+        return cols
+
+    def header(self, name):
+        """Cabeçalho (linha 1) da aba: do cache, ou lendo só a primeira linha."""
+        header = self._headers.get(name)
+        if header is None:
+            entry = self._fresh_entry(name)
+            if entry and entry[1]:
+                header = entry[1][0]
+            else:
+                response = self.sheets[name].spreadsheet.values_batch_get(
+                    [absolute_range_name(self.sheets[name].title, "1:1")]
+                )
+                rows = response.get("valueRanges", [{}])[0].get("values", [])
+                header = rows[0] if rows else []
+            self._set_header(name, header)
+        return header
+
+    def _set_header(self, name, header):
+        with self._cache_lock:
+            self._headers[name] = list(header)
+            # Colunas mudaram de lugar: os nomes precisam ser resolvidos de novo
+            for key in [k for k in self._resolved_columns if k[0] == name]:
+                del self._resolved_columns[key]
+
+    @staticmethod
+    def _project(values, cols):
+        return [[row[c - 1] if c - 1 < len(row) else "" for c in cols] for row in values]
+
+    def _cached_projection(self, name, cols):
+        """Projeção ainda no TTL, ou recortada da aba inteira em cache; None se precisa baixar."""
+        projection = self._projections.get(name, {}).get(cols)
+        if projection and time.monotonic() - projection[0] < self.cache_ttl.get(name, 0):
+            return projection[1]
+        entry = self._fresh_entry(name)
+        if entry:
+            values = self._project(entry[1], cols)
+            with self._cache_lock:
+                # Mesmo timestamp da aba: expira junto com ela
+                if self._cache.get(name) is entry:
+                    self._projections.setdefault(name, {})[cols] = (entry[0], values)
+            return values
+        return None
+
+    def _fetch_projection(self, cols_por_aba):
+        """
+        Baixa só as colunas pedidas de abas da mesma planilha, num único batchGet,
+        junto com a linha de cabeçalho de cada aba. Devolve ({nome: linhas projetadas},
+        {abas cujo cabeçalho mudou}).
+        """
+        names = list(cols_por_aba)
+        locks = [self._fetch_lock(name) for name in names]
+        for lock in locks:
+            lock.acquire()
+        try:
+            result, pendentes = {}, {}
+            for name in names:
+                values = self._cached_projection(name, cols_por_aba[name])
+                if values is None:
+                    pendentes[name] = cols_por_aba[name]
+                else:
+                    result[name] = values
+            if not pendentes:
+                return result, set()
+
+            # Colunas contíguas viram uma faixa só ('A:I'); cada aba pode ter várias.
+            # A linha 1 inteira vem junto: colunas movidas na planilha mudam os nomes resolvidos
+            faixas = {name: _faixas_colunas(cols) for name, cols in pendentes.items()}
+            versions = {name: self._fetch_token(name) for name in pendentes}
+            ranges = [
+                absolute_range_name(self.sheets[name].title, faixa)
+                for name in pendentes for faixa in ["1:1"] + [f"{_letra(a)}:{_letra(b)}" for a, b in faixas[name]]
+            ]
+            value_ranges = iter(self.sheets[names[0]].spreadsheet.values_batch_get(ranges).get("valueRanges", []))
+
+            mudaram = set()
+            for name, cols in pendentes.items():
+                linha_1 = next(value_ranges, {}).get("values", [])
+                header = linha_1[0] if linha_1 else []
+                if name not in self._headers or _sem_vazios_no_fim(header) != _sem_vazios_no_fim(self._headers[name]):
+                    if name in self._headers:
+                        mudaram.add(name)
+                    self._set_header(name, header)
+
+                # Uma faixa por vez, cada uma com suas linhas (a API corta vazios no final)
+                blocos = [(a, next(value_ranges, {}).get("values", [])) for a, _ in faixas[name]]
+                total = max((len(rows) for _, rows in blocos), default=0)
+                values = []
+                for i in range(total):
+                    celulas = {}
+                    for a, rows in blocos:
+                        for c, valor in enumerate(rows[i] if i < len(rows) else [], start=a):
+                            celulas[c] = valor
+                    values.append([celulas.get(c, "") for c in cols])
+                with self._cache_lock:
+                    # Escrita durante o download: devolve, mas não guarda
+                    if self._fetch_token(name) == versions[name] and self.cache_ttl.get(name, 0) > 0:
+                        self._projections.setdefault(name, {})[cols] = (time.monotonic(), values)
+                        fingerprint = _fingerprint(values)
+                        if self._fingerprints.get((name, cols)) != fingerprint:
+                            self._fingerprints[(name, cols)] = fingerprint
+                            self._projection_generations[name] = self._projection_generations.get(name, 0) + 1
+                result[name] = values
+            return result, mudaram
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    # ==========================
+    # NOTIFICAÇÃO DE ESCRITAS
+    # ==========================
+
+    def add_listener(self, callback):
+        """Registra callback(nome_aba, evento, dados), chamado após cada escrita feita pelo app."""
+        self._listeners.append(callback)
+
+    def after_append(self, ws_or_name, rows, response=None, start_row=None):
+        """
+        Chamar após append_row(s). 'response' é o retorno do gspread (traz as linhas gravadas);
+        quem já sabe a posição (ex: WriteBatch) informa start_row.
+        """
+        if start_row is None:
+            start_row = appended_start_row(response)
+        self._after_write(ws_or_name, "append", {"rows": rows, "start_row": start_row})
+
+    def after_update(self, ws_or_name, row_numbers):
+        """Chamar após update/batch_update, com os números das linhas alteradas."""
+        self._after_write(ws_or_name, "update", {"row_numbers": list(row_numbers)})
+
+    def after_delete(self, ws_or_name, start, end=None):
+        """Chamar após delete_rows(start, end)."""
+        self._after_write(ws_or_name, "delete", {"start": start, "end": end or start})
+
+    def _after_write(self, ws_or_name, event, data):
+        name = self.sheet_name(ws_or_name)
+        if name is None:
+            return
+        self.invalidate(name)
+        for callback in list(self._listeners):
+            try:
+                callback(name, event, data)
+            except Exception as e:
+                # Uma estrutura derivada com problema não pode derrubar a escrita do usuário
+                print(f"⚠️ [DB] Falha ao propagar '{event}' em '{name}': {e}")
+
+    def invalidate(self, *sheets):
+        """Descarta o cache das abas informadas (nome ou Worksheet). Chamar após toda escrita."""
+        with self._cache_lock:
+            for ws_or_name in sheets:
+                name = self.sheet_name(ws_or_name)
+                if name is None:
+                    continue
+                for affected in (name, *DEPENDENT_SHEETS.get(name, ())):
+                    self._cache.pop(affected, None)
+                    self._projections.pop(affected, None)
+                    # Depois de uma escrita, o próximo download sempre conta como dado novo
+                    for key in [k for k in self._fingerprints if k == affected or (isinstance(k, tuple) and k[0] == affected)]:
+                        del self._fingerprints[key]
+                    self._versions[affected] = self._versions.get(affected, 0) + 1
+
+    # ==========================
+    # MUDANÇAS FEITAS FORA DO APP (SheetWatcher)
+    # ==========================
+
+    def renew(self, names):
+        """
+        Renova o TTL do que está em cache: a planilha não mudou desde a última
+        verificação. Só há no cache o que foi baixado depois da última mudança
+        detectada (expire() descarta o resto), então o conteúdo continua atual.
+        """
+        agora = time.monotonic()
+        with self._cache_lock:
+            for name in names:
+                entry = self._cache.get(name)
+                if entry:
+                    self._cache[name] = (agora, entry[1], entry[2])
+                for cols, (_, values) in list(self._projections.get(name, {}).items()):
+                    self._projections[name][cols] = (agora, values)
+
+    def expire(self, names):
+        """
+        Descarta o cache de abas alteradas fora do app (direto no Sheets ou pelo bot).
+        Diferente de invalidate(), mantém as impressões digitais: aba baixada de
+        novo com o mesmo conteúdo não vira dado novo (geração e ETags seguem valendo).
+        """
+        with self._cache_lock:
+            for name in names:
+                self._cache.pop(name, None)
+                self._projections.pop(name, None)
+                self._expirations[name] = self._expirations.get(name, 0) + 1
+
+    def refresh(self, names):
+        """Baixa de novo as abas que não estão no cache, num batchGet por planilha."""
+        self._snapshot_entries(names)
+
+def _fingerprint(values):
+    """Hash curto do conteúdo de uma aba (linhas e células)."""
+    h = hashlib.blake2b(digest_size=16)
+    for row in values:
+        h.update("\x1f".join(str(c) for c in row).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.digest()
+
+def _sem_vazios_no_fim(row):
+    """A API corta células vazias no fim da linha; get_all_values completa até a largura da aba."""
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+def _letra(col):
+    """3 -> 'C'"""
+    return rowcol_to_a1(1, col)[:-1]
+
+def _faixas_colunas(cols):
+    """(1, 2, 3, 9, 4) -> [(1, 4), (9, 9)]"""
+    faixas = []
+    for c in sorted(set(cols)):
+        if faixas and c == faixas[-1][1] + 1:
+            faixas[-1] = (faixas[-1][0], c)
+        else:
+            faixas.append((c, c))
+    return faixas
+
+def appended_start_row(response):
+    """Primeira linha gravada por append_row(s), lida de 'updates.updatedRange' (ex: 'PEDIDOS!A10:M12')."""
+    try:
+        updated_range = response["updates"]["updatedRange"]
+    except (KeyError, TypeError):
+        return None
+    start = updated_range.split("!")[-1].split(":")[0]
+    return a1_to_rowcol(start)[0]
+
 # Instância global para ser importada
 db = SheetsDB()
\ No newline at end of file
@@ -0,0 +1,83 @@
+# app/etag.py
+"""
+GET condicional (ETag / If-None-Match) para as telas de leitura.
+
+O ETag de uma página sai do estado das abas de que ela depende (db.data_version:
+escritas do app + conteúdo baixado do Sheets; order_index.data_version para o
+que é lido pelo índice NR_PED), do usuário, da URL com a query string e do dia
+(prazos "atrasado/hoje" mudam com a data). Se o navegador manda
+o mesmo ETag, a resposta é 304 sem ler planilha nem renderizar template.
+
+Só há 304 quando todas as abas estão no cache dentro do TTL (e os índices em dia). Fora disso a
+página é montada normalmente (lendo o Sheets) e sai com o ETag novo.
+Com mensagens flash pendentes na sessão a página é montada normalmente, sem
+ETag nem 304 (o flash tem que aparecer e não entra no ETag).
+"""
+import hashlib
+import uuid
+from datetime import date
+from functools import wraps
+from flask import request, session, make_response
+from app.db import db
+from app.services.order_index import order_index
+
+# Muda a cada processo: versões/gerações recomeçam do zero após um restart
+_BOOT_ID = uuid.uuid4().hex
+
+
+def _abas(sheets):
+    """Nomes das abas; entradas chamáveis escolhem abas conforme a requisição."""
+    nomes = []
+    for sheet in sheets:
+        nomes.extend(sheet() if callable(sheet) else (sheet,))
+    return nomes
+
+
+def _etag(sheets, indexed, versions):
+    versao = db.data_version(_abas(sheets))
+    versao_indice = order_index.data_version(indexed)
+    versoes = tuple(f() for f in versions)
+    if versao is None or versao_indice is None or None in versoes:
+        return None
+    chave = (_BOOT_ID, session.get("usuario"), request.full_path, date.today().isoformat(), versao, versao_indice, versoes)
+    return hashlib.sha1(repr(chave).encode("utf-8")).hexdigest()
+
+
+def conditional_get(*sheets, indexed=(), versions=()):
+    """
+    Decorator de rota: responde 304 quando o If-None-Match bate com o estado atual
+    de 'sheets' (lidas do cache), 'indexed' (lidas pelo índice NR_PED) e 'versions'
+    (funções que devolvem a versão de um estado em memória, ou None se não sabem
+    sem acessar a rede), e marca as respostas 200 com o ETag. Uma entrada de
+    'sheets' pode ser uma função que devolve as abas lidas por esta requisição.
+        @conditional_get('pedidos', 'itens', 'custos')
+        @conditional_get('cad_status', indexed=('status', 'itens'))
+        @conditional_get('clientes', versions=(user_directory.data_version,))
+        @conditional_get(lambda: ['pagamentos'] if request.args.get('cliente') else [])
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return view(*args, **kwargs)
+            if session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            antes = etag = _etag(sheets, indexed, versions)
+            if etag and request.if_none_match.contains(etag):
+                response = make_response("", 304)
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "private, no-cache"
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                # Depois da view: o cache já tem o que foi lido (e escrito) para montar a página.
+                # Se algo mudou durante a montagem, melhor ficar sem ETag do que marcar dado velho.
+                etag = _etag(sheets, indexed, versions)
+                if etag and antes in (None, etag):
+                    response.set_etag(etag)
+                    response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapper
+    return decorator
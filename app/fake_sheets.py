@@ -0,0 +1,319 @@
+# app/fake_sheets.py
+"""
+Backend local (em memória) que imita o subconjunto do gspread usado pelo app.
+
+Ativado com SHEETS_BACKEND=fake. Cada aba é semeada a partir de um CSV com o
+mesmo nome da worksheet (ex: PEDIDOS.csv) no diretório SHEETS_FAKE_DIR
+(padrão: fixtures/sheets). Escritas ficam só na memória do processo.
+
+SHEETS_FAKE_LATENCY_MS simula a latência de cada chamada à API, para medir
+as rotas de forma repetível sem depender da rede.
+"""
+import csv
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from gspread.cell import Cell
+from gspread.utils import a1_to_rowcol, column_letter_to_index, numericise_all, rowcol_to_a1, to_records
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fixtures", "sheets")
+
+
+def _formatted(value):
+    """Aproxima o valor exibido pelo Sheets (FORMATTED_VALUE) numa planilha pt_BR."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float):
+        return str(value).replace(".", ",")
+    return str(value)
+
+
+def _parse_range(range_name):
+    """'J5:K5' / 'I10' -> (linha_ini, col_ini, linha_fim, col_fim). Ignora prefixo 'ABA!'."""
+    range_name = range_name.split("!")[-1]
+    start, _, end = range_name.partition(":")
+    r1, c1 = a1_to_rowcol(start)
+    r2, c2 = a1_to_rowcol(end) if end else (r1, c1)
+    return r1, c1, r2, c2
+
+
+def _column_index(a1):
+    letters = "".join(c for c in a1 if c.isalpha())
+    return column_letter_to_index(letters) if letters else 1
+
+
+def _row_index(a1):
+    digits = "".join(c for c in a1 if c.isdigit())
+    return int(digits) if digits else None
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, sheet_id, title, values):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.spreadsheet_id = spreadsheet.id
+        self.title = title
+        self._values = values
+        self._lock = threading.Lock()
+
+    # --- helpers internos ---
+    def _call(self):
+        self.spreadsheet.client.simulate_latency()
+
+    def _touch(self):
+        self.spreadsheet.touch()
+
+    def _padded(self):
+        width = max((len(r) for r in self._values), default=0)
+        return [list(r) + [""] * (width - len(r)) for r in self._values]
+
+    def _slice(self, a1=""):
+        """Valores de um intervalo A1 ('', 'A:I', 'A2:C10'), sem células vazias no final (como a API)."""
+        rows = self._values
+        if a1:
+            start, _, end = a1.partition(":")
+            c1 = _column_index(start)
+            if not end:
+                c2 = c1
+            elif any(ch.isalpha() for ch in end):
+                c2 = _column_index(end)
+            else:
+                c2 = None  # '1:1': linha inteira
+            r1 = _row_index(start) or 1
+            r2 = _row_index(end) or len(rows)
+            rows = [r[c1 - 1:c2] for r in rows[r1 - 1:r2]]
+        result = []
+        for r in rows:
+            r = list(r)
+            while r and r[-1] == "":
+                r.pop()
+            result.append(r)
+        while result and not result[-1]:
+            result.pop()
+        return result
+
+    def _set(self, row, col, value):
+        while len(self._values) < row:
+            self._values.append([])
+        line = self._values[row - 1]
+        while len(line) < col:
+            line.append("")
+        line[col - 1] = _formatted(value)
+
+    def _write_block(self, row, col, rows):
+        for r_off, line in enumerate(rows):
+            for c_off, value in enumerate(line):
+                self._set(row + r_off, col + c_off, value)
+
+    # --- leitura ---
+    def get_all_values(self, **kwargs):
+        self._call()
+        with self._lock:
+            return self._padded()
+
+    def get_all_records(self, **kwargs):
+        values = self.get_all_values()
+        if not values:
+            return []
+        return to_records(values[0], [numericise_all(row) for row in values[1:]])
+
+    def col_values(self, col, **kwargs):
+        self._call()
+        with self._lock:
+            col_vals = [r[col - 1] if col - 1 < len(r) else "" for r in self._values]
+        # Igual ao Sheets: não devolve as células vazias do final da coluna
+        while col_vals and col_vals[-1] == "":
+            col_vals.pop()
+        return col_vals
+
+    def row_values(self, row, **kwargs):
+        self._call()
+        with self._lock:
+            line = list(self._values[row - 1]) if row - 1 < len(self._values) else []
+        while line and line[-1] == "":
+            line.pop()
+        return line
+
+    def cell(self, row, col, **kwargs):
+        self._call()
+        with self._lock:
+            line = self._values[row - 1] if row - 1 < len(self._values) else []
+            value = line[col - 1] if col - 1 < len(line) else ""
+        return Cell(row, col, value)
+
+    # --- escrita ---
+    def append_rows(self, values, value_input_option=None, **kwargs):
+        self._call()
+        with self._lock:
+            # O Sheets anexa depois da última linha com dados
+            while self._values and not any(self._values[-1]):
+                self._values.pop()
+            start = len(self._values) + 1
+            self._write_block(start, 1, values)
+            end = len(self._values)
+            width = max((len(r) for r in values), default=1)
+        self._touch()
+        updated_range = f"{self.title}!{rowcol_to_a1(start, 1)}:{rowcol_to_a1(end, width)}"
+        return {"updates": {"updatedRange": updated_range, "updatedRows": len(values)}}
+
+    def append_row(self, values, value_input_option=None, **kwargs):
+        return self.append_rows([values], value_input_option=value_input_option)
+
+    def update(self, values=None, range_name=None, value_input_option=None, **kwargs):
+        # Aceita as duas assinaturas do gspread: update(range, values) e update(values, range)
+        if isinstance(values, str):
+            values, range_name = range_name, values
+        self._call()
+        row, col, _, _ = _parse_range(range_name or "A1")
+        with self._lock:
+            self._write_block(row, col, values)
+        self._touch()
+        return {"updatedRange": f"{self.title}!{range_name}"}
+
+    def update_cell(self, row, col, value):
+        self._call()
+        with self._lock:
+            self._set(row, col, value)
+        self._touch()
+
+    def batch_update(self, data, value_input_option=None, **kwargs):
+        self._call()
+        with self._lock:
+            for item in data:
+                row, col, _, _ = _parse_range(item["range"])
+                self._write_block(row, col, item["values"])
+        self._touch()
+        return {"totalUpdatedCells": sum(len(r) for item in data for r in item["values"])}
+
+    def delete_rows(self, start_index, end_index=None):
+        self._call()
+        end_index = end_index or start_index
+        with self._lock:
+            del self._values[start_index - 1:end_index]
+        self._touch()
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+        self._worksheets = {}
+        self.modified_at = time.time()
+
+    def touch(self):
+        self.modified_at = time.time()
+
+    def get_lastUpdateTime(self):
+        """Imita o modifiedTime do Drive (RFC 3339, UTC) da planilha."""
+        self.client.simulate_latency()
+        return datetime.fromtimestamp(self.modified_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def values_batch_get(self, ranges, params=None):
+        """Imita spreadsheets.values.batchGet: uma chamada para vários intervalos."""
+        self.client.simulate_latency()
+        value_ranges = []
+        for range_name in ranges:
+            title, _, a1 = range_name.partition("!")
+            title = title.strip("'").replace("''", "'")
+            ws = self._load_worksheet(title)
+            with ws._lock:
+                values = ws._slice(a1)
+            value_ranges.append({"range": range_name, "majorDimension": "ROWS", "values": values})
+        return {"spreadsheetId": self.id, "valueRanges": value_ranges}
+
+    def values_update(self, range_name, params=None, body=None):
+        """Imita spreadsheets.values.update num intervalo 'ABA!A1'."""
+        title, _, a1 = range_name.partition("!")
+        ws = self._load_worksheet(title.strip("'").replace("''", "'"))
+        return ws.update(a1, (body or {}).get("values", []))
+
+    def values_batch_update(self, body=None):
+        """Imita spreadsheets.values.batchUpdate: vários intervalos 'ABA!A1:C3' numa chamada."""
+        self.client.simulate_latency()
+        responses = []
+        for item in (body or {}).get("data", []):
+            title, _, a1 = item["range"].partition("!")
+            ws = self._load_worksheet(title.strip("'").replace("''", "'"))
+            row, col, _, _ = _parse_range(a1)
+            with ws._lock:
+                ws._write_block(row, col, item.get("values", []))
+            responses.append({"updatedRange": item["range"]})
+        self.touch()
+        return {"spreadsheetId": self.id, "responses": responses}
+
+    def batch_update(self, body):
+        """Imita spreadsheets.batchUpdate com deleteDimension (exclusão de linhas), tudo numa chamada."""
+        self.client.simulate_latency()
+        por_id = {ws.id: ws for ws in self._worksheets.values()}
+        replies = []
+        for req in body.get("requests", []):
+            kind, params = next(iter(req.items()))
+            if kind != "deleteDimension":
+                raise ValueError(f"[FAKE] batchUpdate '{kind}' não suportado")
+            rng = params["range"]
+            ws = por_id[rng["sheetId"]]
+            with ws._lock:
+                del ws._values[rng["startIndex"]:rng["endIndex"]]
+            replies.append({})
+        self.touch()
+        return {"spreadsheetId": self.id, "replies": replies}
+
+    def _load_worksheet(self, title):
+        if title not in self._worksheets:
+            values = self.client.load_fixture(title)
+            sheet_id = len(self._worksheets)
+            self._worksheets[title] = FakeWorksheet(self, sheet_id, title, values)
+        return self._worksheets[title]
+
+    def worksheets(self, exclude_hidden=False):
+        """Todas as abas com fixture no diretório (uma única 'chamada')."""
+        self.client.simulate_latency()
+        for title in self.client.fixture_titles():
+            self._load_worksheet(title)
+        return list(self._worksheets.values())
+
+    def worksheet(self, title):
+        self.client.simulate_latency()
+        return self._load_worksheet(title)
+
+
+class FakeClient:
+    """Substitui o gspread.Client: open_by_key() devolve planilhas em memória."""
+
+    def __init__(self, fixtures_dir=DEFAULT_FIXTURES_DIR, latency_ms=0.0):
+        self.fixtures_dir = fixtures_dir
+        self.latency = max(float(latency_ms), 0.0) / 1000.0
+        self._spreadsheets = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            fixtures_dir=os.environ.get("SHEETS_FAKE_DIR", DEFAULT_FIXTURES_DIR),
+            latency_ms=os.environ.get("SHEETS_FAKE_LATENCY_MS", 0) or 0,
+        )
+
+    def simulate_latency(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def fixture_titles(self):
+        if not os.path.isdir(self.fixtures_dir):
+            return []
+        return sorted(f[:-4] for f in os.listdir(self.fixtures_dir) if f.endswith(".csv"))
+
+    def load_fixture(self, title):
+        path = os.path.join(self.fixtures_dir, f"{title}.csv")
+        if not os.path.exists(path):
+            print(f"⚠️ [FAKE] Fixture não encontrada para '{title}' ({path}). Aba começa vazia.")
+            return []
+        with open(path, newline="", encoding="utf-8") as f:
+            return [row for row in csv.reader(f)]
+
+    def open_by_key(self, key):
+        self.simulate_latency()
+        if key not in self._spreadsheets:
+            self._spreadsheets[key] = FakeSpreadsheet(self, key)
+        return self._spreadsheets[key]
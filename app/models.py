@@ -0,0 +1,228 @@
+# app/models.py
+"""
+Registros tipados das abas de pedidos (Pedido, Item, Custo e Pagamento) e
+dos usuários do ADM_BOT (Usuario).
+
+Cada registro guarda as colunas da aba (texto como veio do Sheets) e os campos
+já convertidos (valor, datas, pago, status normalizado/slug), calculados uma
+única vez quando os dados chegam. Usam __slots__: sem um dict por linha com as
+chaves do cabeçalho repetidas.
+
+As listas são montadas a partir dos valores brutos da aba, com as colunas
+localizadas pelo nome no cabeçalho (linha 1), como no get_all_records(): inserir
+ou reordenar colunas na planilha não troca os campos. As listas são
+reaproveitadas enquanto o cache devolver os mesmos valores: a conversão só
+roda de novo quando chegam dados novos do Sheets.
+
+Nos templates e nas rotas o acesso continua igual ao dos registros antigos:
+p.CLIENTE, p["CLIENTE"] ou p.get("CLIENTE").
+"""
+import threading
+import unicodedata
+from datetime import date
+from app.services.order_index import normalize_key
+from app.utils import parse_float, parse_date, is_paid, norm_status, slugify_status
+
+# Quantas listas (versões dos dados) cada tipo guarda prontas
+_MEMO_MAX = 4
+
+
+def valor_monetario(value):
+    """'R$ 1.234,50' (inclusive com espaço invisível) -> 1234.5; inválido -> 0.0"""
+    if isinstance(value, str):
+        value = unicodedata.normalize("NFKD", value)
+    return parse_float(value)
+
+
+def numero_pedido(value):
+    """'#088' -> 88; sem dígitos -> 0"""
+    digitos = "".join(c for c in str(value or "") if c.isdigit())
+    return int(digitos) if digitos else 0
+
+
+def chave_fone(value):
+    """'(65) 99999-0000' -> '65999990000'; sem dígitos -> texto sem espaços nas pontas"""
+    texto = str(value if value is not None else "").strip()
+    return "".join(c for c in texto if c.isdigit()) or texto
+
+
+def chave_nome(value):
+    """' ana  souza ' -> 'ANA SOUZA'"""
+    return " ".join(str(value if value is not None else "").split()).upper()
+
+
+class Registro:
+    """Base: COLUNAS com os nomes do cabeçalho; subclasses calculam os campos convertidos em _converter()."""
+
+    __slots__ = ("row_index",)
+    COLUNAS = ()
+
+    # Memo por classe: id(valores) -> (valores, registros)
+    _memo = None
+    _memo_lock = None
+
+    def __init__(self, valores, row_index=None, posicoes=None):
+        """'valores' na ordem de COLUNAS, ou, com 'posicoes' (de posicoes()), uma linha da aba."""
+        self.row_index = row_index
+        for i, coluna in enumerate(self.COLUNAS):
+            p = i if posicoes is None else posicoes[i]
+            setattr(self, coluna, valores[p] if p is not None and p < len(valores) else "")
+        self._converter()
+
+    def _converter(self):
+        pass
+
+    @classmethod
+    def from_record(cls, record, row_index=None):
+        """A partir de um registro no formato de db.get_records()."""
+        return cls([record.get(c, "") for c in cls.COLUNAS], row_index)
+
+    @classmethod
+    def posicoes(cls, header):
+        """Posição de cada coluna de COLUNAS no cabeçalho (None se a aba não tem a coluna)."""
+        indice = {}
+        for i, nome in enumerate(header):
+            indice.setdefault(str(nome).strip(), i)
+        return tuple(indice.get(coluna) for coluna in cls.COLUNAS)
+
+    @classmethod
+    def from_values(cls, values):
+        """Lista de registros a partir dos valores brutos da aba (linha 1 = cabeçalho)."""
+        if not values:
+            return []
+        posicoes = cls.posicoes(values[0])
+        return [cls(row, i, posicoes) for i, row in enumerate(values[1:], start=2) if any(row)]
+
+    @classmethod
+    def lista(cls, values):
+        """Como from_values, mas reaproveita a lista enquanto 'values' for o mesmo objeto do cache."""
+        with cls._memo_lock:
+            hit = cls._memo.get(id(values))
+            if hit and hit[0] is values:
+                return hit[1]
+        registros = cls.from_values(values)
+        with cls._memo_lock:
+            cls._memo[id(values)] = (values, registros)
+            while len(cls._memo) > _MEMO_MAX:
+                del cls._memo[next(iter(cls._memo))]
+        return registros
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._memo = {}
+        cls._memo_lock = threading.Lock()
+
+    # --- acesso como dicionário (templates e código que usava get_records) ---
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        campos = ", ".join(f"{c}={getattr(self, c)!r}" for c in self.COLUNAS[:3])
+        return f"{type(self).__name__}({campos})"
+
+
+class Pedido(Registro):
+    COLUNAS = (
+        "STATUS", "NR_PED", "CLIENTE", "PACIENTE", "DT_PEDIDO", "DT_PRAZO", "DT_ENTREG",
+        "VLR_PED", "PAGO", "PGTO_CONF", "DT_RECEB", "PRAZO_DIAS", "OBS_PED",
+    )
+    __slots__ = COLUNAS + (
+        "nr", "nr_num", "valor", "prazo", "entrega", "pago", "status", "status_slug", "entregue",
+        "ITENS", "CUSTOS",
+    )
+
+    def _converter(self):
+        self.nr = normalize_key(self.NR_PED)
+        self.nr_num = numero_pedido(self.NR_PED)
+        self.valor = valor_monetario(self.VLR_PED)
+        self.prazo = parse_date(self.DT_PRAZO)
+        self.entrega = parse_date(self.DT_ENTREG)
+        self.pago = is_paid(self.PAGO)
+        self.status = norm_status(self.STATUS)
+        self.status_slug = slugify_status(self.STATUS)
+        self.entregue = self.status == "entregue"
+        self.ITENS = []
+        self.CUSTOS = []
+
+    @property
+    def VLR_NUM(self):
+        return self.valor
+
+    @property
+    def DIAS_DELTA(self):
+        """Dias até o prazo (negativo = atrasado); None sem prazo."""
+        return (self.prazo - date.today()).days if self.prazo else None
+
+
+class Item(Registro):
+    COLUNAS = ("NR_PED", "PRODUTO", "QTD_ITEM", "COR", "VLR_CAT", "VLR_COB", "TOTAL_PROD", "OBS_ITEM")
+    __slots__ = COLUNAS + ("nr", "total")
+
+    def _converter(self):
+        self.nr = normalize_key(self.NR_PED)
+        self.total = valor_monetario(self.TOTAL_PROD)
+
+
+class Custo(Registro):
+    COLUNAS = ("NR_PED", "DESC_CUSTO", "QTD_CUSTO", "VLR_UN_CUSTO", "VLR_TOT_CUSTO", "OBS_CUSTO")
+    __slots__ = COLUNAS + ("nr", "total")
+
+    def _converter(self):
+        self.nr = normalize_key(self.NR_PED)
+        self.total = valor_monetario(self.VLR_TOT_CUSTO)
+
+
+class Pagamento(Registro):
+    COLUNAS = ("CLIENTE", "DT_RECEB", "VLR_RECEB", "OBS")
+    __slots__ = COLUNAS + ("cliente", "valor", "data")
+
+    def _converter(self):
+        self.cliente = str(self.CLIENTE).strip()
+        self.valor = valor_monetario(self.VLR_RECEB)
+        self.data = parse_date(self.DT_RECEB)
+
+
+class Usuario(Registro):
+    COLUNAS = ("NOME", "FONE_ADM", "SENHA", "LAYOUT_CARDS")
+    __slots__ = COLUNAS + ("nome", "fone", "layout")
+
+    def _converter(self):
+        self.nome = chave_nome(self.NOME)
+        self.fone = chave_fone(self.FONE_ADM)
+        layout = str(self.LAYOUT_CARDS).strip()
+        self.layout = layout.split(",") if layout else []
+
+
+# Junção pedidos + itens + custos, refeita só quando alguma das listas muda
+_detalhes = {"chave": None}
+_detalhes_lock = threading.Lock()
+
+
+def pedidos_com_detalhes(values_pedidos, values_itens, values_custos):
+    """
+    Pedidos com ITENS e CUSTOS preenchidos, a partir dos valores brutos das três abas.
+    Os registros são compartilhados entre requisições: não os altere.
+    """
+    pedidos = Pedido.lista(values_pedidos)
+    itens = Item.lista(values_itens)
+    custos = Custo.lista(values_custos)
+    chave = (id(pedidos), id(itens), id(custos))
+    with _detalhes_lock:
+        if _detalhes["chave"] != chave:
+            itens_por_ped, custos_por_ped = {}, {}
+            for i in itens:
+                itens_por_ped.setdefault(i.nr, []).append(i)
+            for c in custos:
+                custos_por_ped.setdefault(c.nr, []).append(c)
+            for p in pedidos:
+                p.ITENS = itens_por_ped.get(p.nr, [])
+                p.CUSTOS = custos_por_ped.get(p.nr, [])
+            # Guarda as listas junto da chave: os ids não podem ser reaproveitados
+            _detalhes.update(chave=chave, listas=(pedidos, itens, custos))
+    return pedidos
@@ -0,0 +1,181 @@
+# app/rate_limit.py
+"""
+Limite de chamadas à API do Google Sheets, do lado do app.
+
+A cota da API é por minuto (leitura e escrita separadas). Com 8 threads do
+gunicorn batendo ao mesmo tempo, o Sheets devolve 429 e a rota falha. Aqui:
+
+- Um token bucket por tipo (leitura / escrita) ajustado à cota: rajadas
+  esperam a vez por alguns segundos em vez de estourar a cota.
+- Retentativa com backoff exponencial e jitter em 429 e 5xx (5xx só em
+  chamadas idempotentes, para não duplicar um append).
+- Contadores (throttled / retried / failed) em stats(), impressos no log do
+  servidor a cada SHEETS_STATS_INTERVAL segundos enquanto houver chamadas.
+
+Configuração por variável de ambiente:
+  SHEETS_QUOTA_READ_PER_MIN / SHEETS_QUOTA_WRITE_PER_MIN  (padrão 60 / 60)
+  SHEETS_QUOTA_BURST       tamanho da rajada imediata (padrão 10)
+  SHEETS_THROTTLE_MAX_WAIT espera máxima na fila, em segundos (padrão 20)
+  SHEETS_MAX_RETRIES       retentativas após 429/5xx (padrão 5)
+  SHEETS_STATS_INTERVAL    segundos entre resumos dos contadores no log (padrão 600; 0 desliga)
+
+Consultas de metadados ao Drive (modifiedTime, usado pelo SheetWatcher) têm
+cota própria: passam pelo backoff, mas não gastam fichas da cota do Sheets.
+"""
+import os
+import random
+import threading
+import time
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+from gspread.urls import DRIVE_FILES_API_V3_URL
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 32.0
+
+# Chamadas seguras de repetir após um 5xx (refazer não duplica nada)
+IDEMPOTENT_SUFFIXES = ("values:batchGet", "values:batchUpdate", "values:batchClear")
+
+
+def _env_number(name, default):
+    raw = os.environ.get(name)
+    if raw in (None, ""):
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        print(f"⚠️ [API] {name} inválido: {raw!r}. Usando {default}.")
+        return default
+
+
+class TokenBucket:
+    """Libera 'rate_per_min' fichas por minuto, acumulando no máximo 'burst'."""
+
+    def __init__(self, rate_per_min, burst):
+        self.rate = max(rate_per_min, 1) / 60.0
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait):
+        """
+        Pega uma ficha, esperando até max_wait segundos na fila.
+        Devolve o tempo esperado, ou None se a espera passaria do limite.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Reserva a ficha já (tokens pode ficar negativo = fila de espera)
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if wait > max_wait:
+                return None
+            self.tokens -= 1
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class ApiLimiter:
+    def __init__(self, read_per_min=60, write_per_min=60, burst=10, max_wait=20.0, max_retries=5, log_interval=600.0):
+        self.buckets = {
+            "read": TokenBucket(read_per_min, burst),
+            "write": TokenBucket(write_per_min, burst),
+        }
+        self.max_wait = max_wait
+        self.max_retries = int(max_retries)
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "throttled": 0, "throttle_wait_s": 0.0, "retried": 0, "failed": 0}
+        self.log_interval = log_interval
+        self._logged_at = time.monotonic()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            read_per_min=_env_number("SHEETS_QUOTA_READ_PER_MIN", 60),
+            write_per_min=_env_number("SHEETS_QUOTA_WRITE_PER_MIN", 60),
+            burst=_env_number("SHEETS_QUOTA_BURST", 10),
+            max_wait=_env_number("SHEETS_THROTTLE_MAX_WAIT", 20.0),
+            max_retries=_env_number("SHEETS_MAX_RETRIES", 5),
+            log_interval=_env_number("SHEETS_STATS_INTERVAL", 600.0),
+        )
+
+    def count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def log_stats(self):
+        """Imprime os contadores acumulados se já passou log_interval desde o último resumo."""
+        if not self.log_interval:
+            return
+        with self._stats_lock:
+            now = time.monotonic()
+            if now - self._logged_at < self.log_interval:
+                return
+            self._logged_at = now
+            s = dict(self._stats)
+        print(f"📊 [API] {s['calls']} chamadas | {s['throttled']} esperas na fila ({s['throttle_wait_s']:.1f}s) | "
+              f"{s['retried']} retentativas | {s['failed']} falhas")
+
+    def wait_turn(self, kind):
+        waited = self.buckets[kind].acquire(self.max_wait)
+        if waited is None:
+            # Fila longa demais: segue e deixa o backoff tratar um eventual 429
+            self.count("throttled")
+            print(f"⚠️ [API] Fila de {kind} acima de {self.max_wait:.0f}s. Enviando mesmo assim.")
+        elif waited:
+            self.count("throttled")
+            self.count("throttle_wait_s", waited)
+
+    @staticmethod
+    def backoff(attempt, retry_after=None):
+        """Espera antes da retentativa: Retry-After do servidor ou exponencial com jitter total."""
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                pass
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class ThrottledHTTPClient(HTTPClient):
+    """HTTPClient do gspread que passa cada chamada pelo ApiLimiter."""
+
+    def __init__(self, auth, session=None, limiter=None):
+        super().__init__(auth, session)
+        self.limiter = limiter or ApiLimiter.from_env()
+
+    def request(self, method, endpoint, *args, **kwargs):
+        limiter = self.limiter
+        kind = "read" if method.upper() == "GET" or endpoint.endswith("values:batchGet") else "write"
+        idempotent = method.upper() in ("GET", "PUT") or endpoint.endswith(IDEMPOTENT_SUFFIXES)
+        drive = endpoint.startswith(DRIVE_FILES_API_V3_URL)
+        limiter.count("calls")
+        limiter.log_stats()
+
+        attempt = 0
+        while True:
+            if not drive:
+                limiter.wait_turn(kind)
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                status = e.response.status_code
+                retryable = status == 429 or (status in RETRY_STATUS and idempotent)
+                if not retryable or attempt >= limiter.max_retries:
+                    limiter.count("failed")
+                    raise
+                delay = limiter.backoff(attempt, e.response.headers.get("Retry-After"))
+                attempt += 1
+                limiter.count("retried")
+                print(f"⏳ [API] {status} em {method.upper()} ({kind}). Tentativa {attempt + 1} em {delay:.1f}s")
+                time.sleep(delay)
@@ -1,16 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from app.db import db
+from flask import Blueprint, render_template, request, redirect, url_for, session
+from app.services.users import user_directory
 
 # === ESSA LINHA É ONDE O ERRO ESTÁ RECLAMANDO ===
 auth_bp = Blueprint('auth', __name__)
 
 def validar_usuario(fone, senha):
-    usuarios_ws = db.sheets['usuarios']
-    registros = usuarios_ws.get_all_records()
-    for r in registros:
-        if str(r.get("FONE_ADM")).strip() == str(fone).strip() and str(r.get("SENHA")).strip() == str(senha).strip():
-            return r
-    return None
+    # Busca no diretório em memória (telefone normalizado), sem baixar ADM_BOT a cada tentativa
+    return user_directory.autenticar(fone, senha)
 
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
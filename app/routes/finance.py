@@ -1,19 +1,25 @@
 # app/routes/finance.py
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from app.db import db
-from app.services.finance import reconciliar_pagamentos, buscar_extrato_cliente
+from app.services.finance import reconciliar_pagamentos, buscar_extrato_cliente, marcar_cliente_alterado
+from app.services.directory import directory
+from app.services.write_batch import WriteBatch
+from app.etag import conditional_get
 from datetime import datetime
 
 finance_bp = Blueprint('finance', __name__, url_prefix='/financeiro')
 
+def _abas_do_extrato():
+    """O extrato de um cliente lê PEDIDOS e PEDIDOS_PGTOS; a tela de seleção só usa o índice."""
+    return ['pedidos', 'pagamentos'] if request.args.get('cliente') else []
+
 @finance_bp.route('/', methods=['GET', 'POST'])
+@conditional_get(_abas_do_extrato, indexed=('pedidos',))
 def index():
     # 1. CARREGAR E LIMPAR LISTA DE CLIENTES (Sempre executa)
     try:
-        # Pega coluna 3 (C), remove cabeçalho, remove vazios e espaços
-        clientes_raw = db.get_ws('pedidos').col_values(3)
-        clientes_set = {str(c).strip() for c in clientes_raw[1:] if c and str(c).strip()}
-        clientes = sorted(list(clientes_set))
+        # Clientes distintos de PEDIDOS (coluna C), já ordenados e mantidos pelo diretório
+        clientes = directory.clientes_com_pedido()
     except Exception as e:
         print(f"Erro ao carregar clientes: {e}")
         clientes = []
@@ -59,10 +65,13 @@ def index():
                 # 3. SALVAR NO SHEETS
                 # value_input_option='USER_ENTERED' é crucial para o Sheets reconhecer o número
                 ws_pagamentos = db.get_ws('pagamentos')
-                ws_pagamentos.append_row(
-                    [cliente_atual, data_fmt, valor_float, obs], 
+                pagamento_row = [cliente_atual, data_fmt, valor_float, obs]
+                resp = ws_pagamentos.append_row(
+                    pagamento_row, 
                     value_input_option='USER_ENTERED'
                 )
+                db.after_append('pagamentos', [pagamento_row], resp)
+                marcar_cliente_alterado(cliente_atual)
                 
                 flash(f"Pagamento de R$ {valor_str} registrado!", "success")
                 
@@ -77,8 +86,8 @@ def index():
     # 4. SE TEM UM CLIENTE DEFINIDO, BUSCA OS DADOS
     if cliente_atual and cliente_atual in clientes:
         try:
-            # Garante que o reconciliation rode para mostrar dados frescos
-            # (Opcional: pode comentar a linha abaixo se ficar lento)
+            # Garante dados frescos: só baixa (e grava) se pagamentos ou pedidos
+            # entregues do cliente mudaram desde a última reconciliação
             reconciliar_pagamentos(cliente_atual) 
             
             dados = buscar_extrato_cliente(cliente_atual)
@@ -95,8 +104,9 @@ def excluir_pagamento():
     
     if row_index:
         try:
-            # Deleta a linha
-            db.get_ws('pagamentos').delete_rows(int(row_index))
+            # Deleta a linha (mesmo caminho em lote das demais exclusões)
+            WriteBatch().delete_rows('pagamentos', [int(row_index)]).commit()
+            marcar_cliente_alterado(cliente)
             flash("Pagamento excluído com sucesso!", "success")
             
             # Recalcula o saldo
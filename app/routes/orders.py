@@ -1,132 +1,118 @@
 # app/routes/orders.py
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import (
+    Blueprint, render_template, stream_template, request, redirect, url_for, session, flash, jsonify,
+    Response, current_app,
+)
 from datetime import datetime, date, timedelta
 from app.db import db
+from app.services.order_index import order_index
+from app.services.write_batch import WriteBatch
+from app.services.detail_rows import replace_detail_rows
+from app.services.sequence import nr_ped_sequence
+from app.services.directory import directory
+from app.services.finance import marcar_cliente_alterado
+from app.services.users import user_directory
+from app.models import pedidos_com_detalhes
+from app.services.order_filter import colunas_pedidos
+from app.etag import conditional_get
+from itertools import groupby
 from zoneinfo import ZoneInfo # Importado aqui para garantir
 from app.utils import (
-    safe_json_list, append_rows_safe, parse_br_datetime, 
-    replace_detail_rows, get_row_indices_by_col, 
-    slugify_status, parse_float, is_paid, norm_status,
-    parse_date, to_input_datetime, to_float_safe, agrupar_consecutivas, rowcol_to_a1
+    safe_json_list,
+    to_input_datetime, to_float_safe,
 )
 
 orders_bp = Blueprint('orders', __name__)
 
+# Paginação das telas de detalhes (pedidos por página; ?limite= até o máximo).
+# O padrão pode ser trocado por app.config["DETALHES_POR_PAGINA"].
+DETALHES_POR_PAGINA = 100
+DETALHES_MAX_POR_PAGINA = 500
+# Tamanho aproximado de cada bloco enviado no streaming
+STREAM_BLOCO = 16 * 1024
+
 # =====================================================
 # ROTAS DE LEITURA (DETALHES, A RECEBER)
 # =====================================================
 
 @orders_bp.route("/areceber")
+@conditional_get('pedidos', 'itens', 'custos')
 def areceber():
-    # 1. Carrega todas as tabelas necessárias
-    pedidos = db.sheets['pedidos'].get_all_records()
-    itens = db.sheets['itens'].get_all_records()
-    custos = db.sheets['custos'].get_all_records() # <--- FALTAVA ISSO
-    
-    pedidos_filtrados = []
-    hoje = date.today()
-    
-    for p in pedidos:
-        status = norm_status(p.get("STATUS"))
-        pago = is_paid(p.get("PAGO"))
-        
-        if status == "entregue" and not pago:
-            p["VLR_NUM"] = parse_float(p.get("VLR_PED"))
-            
-            # Cálculo de Dias Delta
-            prazo = parse_date(p.get("DT_PRAZO"))
-            if prazo:
-                delta = (prazo - hoje).days
-                p["DIAS_DELTA"] = delta
-            else:
-                p["DIAS_DELTA"] = None
-
-            pedidos_filtrados.append(p)
-
-    # 2. Anexa Itens e Custos
-    for ped in pedidos_filtrados:
-        # Converte para string e remove espaços para garantir o match
-        ped_num = str(ped.get("NR_PED")).strip()
-        
-        ped["ITENS"] = [i for i in itens if str(i.get("NR_PED")).strip() == ped_num]
-        ped["CUSTOS"] = [c for c in custos if str(c.get("NR_PED")).strip() == ped_num]
-
-    from collections import defaultdict
-    agrupado = defaultdict(list)
-    for ped in pedidos_filtrados:
-        agrupado[ped.get("CLIENTE", "—")].append(ped)
-
-    modo_view = request.args.get('modo', 'lista')
-
-    return render_template(
-        "detalhes.html",
-        filtro="A Receber",
-        agrupado=agrupado,
-        tipo="receber",
-        usuario=session.get("usuario"),
-        modo_view=modo_view
-    )
+    # Pedidos tipados (uma leitura em lote, já com itens e custos) filtrados pelo bitmap de "a receber"
+    pedidos_filtrados = colunas_pedidos(_pedidos_com_detalhes()).select("receber", "")
+    return _render_detalhes(pedidos_filtrados, filtro="A Receber", tipo="receber")
 
 @orders_bp.route("/detalhes/<tipo>/<filtro>")
+@conditional_get('pedidos', 'itens', 'custos')
 def detalhes(tipo, filtro):
-    pedidos = db.sheets['pedidos'].get_all_records()
-    itens = db.sheets['itens'].get_all_records()
-    custos = db.sheets['custos'].get_all_records()
-    
-    hoje = date.today()
-    pedidos_filtrados = []
-    
-    for p in pedidos:
-        status = norm_status(p.get("STATUS"))
-        pago = is_paid(p.get("PAGO"))
-        prazo = parse_date(p.get("DT_PRAZO"))
-        p["VLR_NUM"] = parse_float(p.get("VLR_PED"))
-
-        # Lógica de Filtro
-        include = False
-        if tipo == "prazo":
-            if filtro == "atrasados" and prazo and prazo < hoje and status != "entregue": include = True
-            elif filtro == "hoje" and prazo and prazo == hoje and status != "entregue": include = True
-            elif filtro in {"futuro", "futuros"} and prazo and prazo > hoje and status != "entregue": include = True
-        elif tipo == "status" and status == norm_status(filtro): include = True
-        elif tipo == "receber" and status == "entregue" and not pago: include = True
-        elif tipo == "porcliente":
-            if filtro == "todos": include = True
-            elif filtro == "naoentregues" and status != "entregue": include = True
-        elif tipo == "porstatus" and slugify_status(p.get("STATUS", "")) == filtro.lower(): include = True
-
-        if include:
-            if prazo:
-                delta = (prazo - hoje).days
-                p["DIAS_DELTA"] = delta
-            else:
-                p["DIAS_DELTA"] = None
-            
-            pedidos_filtrados.append(p)
-
-    # Anexa Itens e Custos (CORRIGIDO AQUI)
-    for ped in pedidos_filtrados:
-        ped_num = str(ped.get("NR_PED")).strip()
-        
-        ped["ITENS"] = [i for i in itens if str(i.get("NR_PED")).strip() == ped_num]
-        # Faltava essa linha abaixo no seu código original:
-        ped["CUSTOS"] = [c for c in custos if str(c.get("NR_PED")).strip() == ped_num]
-
-    from collections import defaultdict
-    agrupado = defaultdict(list)
-    for ped in pedidos_filtrados:
-        agrupado[ped.get("CLIENTE", "—")].append(ped)
-
+    # Filtro por bitmaps (status, prazo por dia, entregue/pago): consulta + gather, sem varrer os pedidos
+    pedidos_filtrados = colunas_pedidos(_pedidos_com_detalhes()).select(tipo, filtro, date.today())
+    return _render_detalhes(pedidos_filtrados, filtro=filtro.title(), tipo=tipo)
+
+def _render_detalhes(pedidos_filtrados, filtro, tipo):
+    """
+    Página de detalhes paginada por cursor e enviada em streaming.
+    Os pedidos ficam agrupados por cliente (na ordem em que cada cliente aparece);
+    cada página leva até DETALHES_POR_PAGINA pedidos e o cursor é o NR_PED do
+    último pedido mostrado, então a página seguinte continua dali mesmo que
+    o grupo do cliente tenha sido cortado.
+    """
     modo_view = request.args.get('modo', 'lista')
+    limite = _limite_pagina()
 
-    return render_template(
-        "detalhes.html",
-        filtro=filtro.title(),
-        agrupado=agrupado,
-        tipo=tipo,
-        usuario=session.get("usuario"),
-        modo_view=modo_view
-    )
+    # Ordem dos grupos: primeira aparição do cliente (sort estável mantém a ordem da planilha dentro do grupo)
+    ordem_cliente = {}
+    for ped in pedidos_filtrados:
+        ordem_cliente.setdefault(ped.get("CLIENTE", "—"), len(ordem_cliente))
+    sequencia = sorted(pedidos_filtrados, key=lambda ped: ordem_cliente[ped.get("CLIENTE", "—")])
+
+    inicio = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        # Cursor que sumiu (pedido excluído/alterado) recomeça do início
+        inicio = next((i + 1 for i, ped in enumerate(sequencia) if ped.nr == cursor), 0)
+    pagina = sequencia[inicio:inicio + limite]
+    proximo_cursor = pagina[-1].nr if pagina and inicio + limite < len(sequencia) else None
+
+    contexto = {
+        "filtro": filtro,
+        # Grupos gerados sob demanda durante o streaming
+        "agrupado": groupby(pagina, key=lambda ped: ped.get("CLIENTE", "—")),
+        "tipo": tipo,
+        "usuario": session.get("usuario"),
+        "modo_view": modo_view,
+        "total_pedidos": len(sequencia),
+        "mostrados_ate": inicio + len(pagina),
+        "proximo_url": url_for(
+            request.endpoint, **(request.view_args or {}), cursor=proximo_cursor, modo=modo_view, limite=limite
+        ) if proximo_cursor else None,
+    }
+    return Response(_em_blocos(stream_template("detalhes.html", **contexto)), mimetype="text/html")
+
+def _limite_pagina():
+    padrao = current_app.config.get("DETALHES_POR_PAGINA", DETALHES_POR_PAGINA)
+    try:
+        limite = int(request.args.get('limite', padrao))
+    except ValueError:
+        limite = padrao
+    return max(1, min(limite, DETALHES_MAX_POR_PAGINA))
+
+def _em_blocos(partes, tamanho=STREAM_BLOCO):
+    """Junta os pedaços do template em blocos de ~tamanho bytes (menos writes pequenos no socket)."""
+    buffer, acumulado = [], 0
+    for parte in partes:
+        buffer.append(parte)
+        acumulado += len(parte)
+        if acumulado >= tamanho:
+            yield "".join(buffer)
+            buffer, acumulado = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+def _pedidos_com_detalhes():
+    """Pedidos tipados com ITENS e CUSTOS (compartilhados entre requisições: não altere)."""
+    dados = db.snapshot_values(['pedidos', 'itens', 'custos'])
+    return pedidos_com_detalhes(dados['pedidos'], dados['itens'], dados['custos'])
 
 
 # =====================================================
@@ -144,34 +130,32 @@ def novo_pedido():
             itens = safe_json_list(request.form.get("itens_json", "[]"), "itens")
             custos = safe_json_list(request.form.get("custos_json", "[]"), "custos")
             
-            # Gera ID
-            pedidos_data = db.sheets['pedidos'].get_all_records()
-            if pedidos_data:
-                numeros = [int(p["NR_PED"]) for p in pedidos_data if str(p.get("NR_PED")).isdigit()]
-                ultimo_ped = max(numeros) if numeros else 0
-            else:
-                ultimo_ped = 0
-            novo_nr_ped = ultimo_ped + 1
+            # Gera ID (contador em memória, sem baixar a aba e sem repetir entre threads)
+            novo_nr_ped = nr_ped_sequence.next()
             
+            # Pedido, itens, custos e status inicial vão juntos num único batchUpdate
+            batch = WriteBatch()
+
             # Salva Pedido
-            db.sheets['pedidos'].append_row([
-                "", novo_nr_ped, cliente, paciente, "", "", "", "", "", "", "", "", obs_ped
-            ], value_input_option="USER_ENTERED")
+            pedido_row = ["", novo_nr_ped, cliente, paciente, "", "", "", "", "", "", "", "", obs_ped]
+            batch.append('pedidos', [pedido_row])
 
             # Salva Itens
             itens_rows = [[novo_nr_ped, i.get("produto"), i.get("qtde"), i.get("cor"), "", i.get("valor"), "", i.get("obs")] for i in itens]
-            append_rows_safe(db.sheets['itens'], itens_rows)
+            batch.append('itens', itens_rows)
 
             # Salva Custos
             custos_rows = [[novo_nr_ped, c.get("desc"), c.get("qtd"), c.get("valor"), "", c.get("obs")] for c in custos]
-            append_rows_safe(db.sheets['custos'], custos_rows)
+            batch.append('custos', custos_rows)
 
             # Salva Status Inicial
             dt_pedido = request.form.get("dt_pedido", "").strip()
             dt_atual = datetime.now().strftime("%d/%m/%Y %H:%M")
-            db.sheets['status'].append_row([
-                novo_nr_ped, "Pedido Registrado", dt_pedido, "1", "", "", session.get("usuario"), dt_atual
-            ], value_input_option="USER_ENTERED")
+            status_row = [novo_nr_ped, "Pedido Registrado", dt_pedido, "1", "", "", session.get("usuario"), dt_atual]
+            batch.append('status', [status_row])
+
+            resultado = batch.commit()
+            print(f"📝 [PEDIDO] #{novo_nr_ped} gravado: " + ", ".join(f"{aba} +{r['rows']}" for aba, r in resultado.items()))
 
             flash(f"✅ Pedido #{novo_nr_ped} criado!", "sucesso")
             return jsonify({"sucesso": True, "nr_ped": novo_nr_ped})
@@ -179,8 +163,7 @@ def novo_pedido():
             return jsonify({"sucesso": False, "erro": str(e)})
 
     # GET: Carrega formulário
-    clientes = sorted([c.get("NOME_CLI") for c in db.sheets['clientes'].get_all_records() if c.get("NOME_CLI")])
-    produtos = sorted([{"PRODUTO": p.get("PRODUTO"), "VLR_CAT": p.get("VLR_CAT")} for p in db.sheets['produtos'].get_all_records() if p.get("PRODUTO")], key=lambda x: x["PRODUTO"])
+    clientes, produtos = db.run_parallel(directory.clientes, directory.produtos)
     
     return render_template("pedido_form.html", modo="novo", usuario=session.get("usuario"), clientes=clientes, produtos=produtos, dt_pedido=datetime.now().strftime("%Y-%m-%dT%H:%M"))
 
@@ -188,11 +171,8 @@ def novo_pedido():
 def salvar_layout():
     data = request.get_json()
     ordem = data.get("ordem", [])
-    registros = db.sheets['usuarios'].get_all_records()
-    for i, r in enumerate(registros, start=2):
-        if r.get("NOME") == session["usuario"]:
-            db.sheets['usuarios'].update_cell(i, 4, ",".join(ordem))
-            break
+    # Linha do usuário já conhecida pelo diretório: grava direto, sem reler ADM_BOT
+    user_directory.salvar_layout(session["usuario"], ordem)
     return {"ok": True}
 
 # =============================
@@ -202,17 +182,22 @@ def salvar_layout():
 def editar_pedido(nr_ped):
     # GET: Carrega dados
     if request.method == "GET":
-        pedidos_data = db.sheets['pedidos'].get_all_records()
-        pedido = next((p for p in pedidos_data if str(p.get("NR_PED")).strip() == str(nr_ped)), None)
+        # Pedido, itens, custos e histórico vêm do índice NR_PED; cadastros do diretório.
+        # As frentes são independentes e rodam em paralelo.
+        pedido, clientes, produtos, itens, custos, status_data = db.run_parallel(
+            lambda: order_index.first_record('pedidos', nr_ped),
+            directory.clientes,
+            directory.produtos,
+            lambda: order_index.records('itens', nr_ped),
+            lambda: order_index.records('custos', nr_ped),
+            lambda: order_index.records('status', nr_ped),
+        )
         
         if not pedido:
             flash("⚠️ Pedido não encontrado.", "erro")
             return redirect(url_for("dashboard.index"))
 
         # Prepara listas
-        itens = [r for r in db.sheets['itens'].get_all_records() if str(r.get("NR_PED")) == str(nr_ped)]
-        custos = [r for r in db.sheets['custos'].get_all_records() if str(r.get("NR_PED")) == str(nr_ped)]
-        
         # Formatação para view
         for i in itens:
             v = to_float_safe(i.get("VLR_COB"))
@@ -227,9 +212,8 @@ def editar_pedido(nr_ped):
             c["TOTAL_VIEW"] = f"{(v*q):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
         # Data do pedido
-        status_data = db.sheets['status'].get_all_records()
         registro_status = next(
-            (s for s in status_data if str(s.get("NR_PED")) == str(nr_ped) and str(s.get("STATUS_HIST")).lower() == "pedido registrado"), 
+            (s for s in status_data if str(s.get("STATUS_HIST")).lower() == "pedido registrado"), 
             None
         )
         dt_pedido_raw = registro_status.get("DT_HR_STATUS", "") if registro_status else ""
@@ -239,8 +223,8 @@ def editar_pedido(nr_ped):
             "modo": "editar",
             "nr_ped": nr_ped,
             "usuario": session.get("usuario"),
-            "clientes": sorted([c.get("NOME_CLI") for c in db.sheets['clientes'].get_all_records() if c.get("NOME_CLI")]),
-            "produtos": sorted([{"PRODUTO": p.get("PRODUTO"), "VLR_CAT": p.get("VLR_CAT")} for p in db.sheets['produtos'].get_all_records() if p.get("PRODUTO")], key=lambda x: x["PRODUTO"]),
+            "clientes": clientes,
+            "produtos": produtos,
             "cliente_atual": pedido.get("CLIENTE", ""),
             "paciente_atual": pedido.get("PACIENTE", ""),
             "obs_atual": pedido.get("OBS_PED", ""),
@@ -258,23 +242,24 @@ def editar_pedido(nr_ped):
         itens = safe_json_list(request.form.get("itens_json", "[]"), "itens")
         custos = safe_json_list(request.form.get("custos_json", "[]"), "custos")
 
-        # Atualiza Capa (Pedido)
-        values = db.sheets['pedidos'].get_all_values()
-        row_indices = get_row_indices_by_col(values, 2, nr_ped)
+        # Capa, itens e custos vão num único batchUpdate, só com as células alteradas
+        batch = WriteBatch()
+
+        # Atualiza Capa (Pedido): CLIENTE, PACIENTE (C:D) e OBS_PED (M)
+        row_indices = order_index.rows('pedidos', nr_ped, verify=True)
         if row_indices:
             row_index = row_indices[0]
-            db.sheets['pedidos'].batch_update([
-                {"range": f"{rowcol_to_a1(row_index, 3)}", "values": [[cliente]]},
-                {"range": f"{rowcol_to_a1(row_index, 4)}", "values": [[paciente]]},
-                {"range": f"{rowcol_to_a1(row_index, 13)}", "values": [[obs_ped]]},
-            ], value_input_option="USER_ENTERED")
+            batch.update_cells('pedidos', row_index, 3, [cliente, paciente])
+            batch.update_cells('pedidos', row_index, 13, [obs_ped])
 
-        # Atualiza Itens e Custos
+        # Atualiza Itens e Custos (VLR_CAT/TOTAL_PROD e VLR_TOT_CUSTO são calculados na planilha)
         itens_rows = [[nr_ped, i.get("produto"), i.get("qtde"), i.get("cor"), "", i.get("valor"), "", i.get("obs")] for i in itens]
-        replace_detail_rows(db.sheets['itens'], 1, nr_ped, itens_rows)
+        replace_detail_rows(db.sheets['itens'], 1, nr_ped, itens_rows, colunas_calculadas={5, 7}, batch=batch)
 
         custos_rows = [[nr_ped, c.get("desc"), c.get("qtd"), c.get("valor"), "", c.get("obs")] for c in custos]
-        replace_detail_rows(db.sheets['custos'], 1, nr_ped, custos_rows)
+        replace_detail_rows(db.sheets['custos'], 1, nr_ped, custos_rows, colunas_calculadas={5}, batch=batch)
+
+        batch.commit()
 
         flash(f"✅ Pedido #{nr_ped} atualizado!", "sucesso")
         return jsonify({"sucesso": True, "nr_ped": nr_ped})
@@ -287,25 +272,16 @@ def editar_pedido(nr_ped):
 @orders_bp.route("/api/excluir_pedido/<nr_ped>", methods=["DELETE"])
 def excluir_pedido(nr_ped):
     try:
-        excluidos = {"pedidos": 0, "itens": 0, "custos": 0, "status": 0}
-        
-        # Helper para deletar em lote
-        def delete_in_sheet(ws_name, col_idx):
-            ws = db.sheets[ws_name]
-            col_vals = ws.col_values(col_idx)
-            rows = [i + 1 for i, val in enumerate(col_vals) if str(val).strip() == str(nr_ped)]
-            count = 0
-            for grupo in agrupar_consecutivas(rows):
-                ws.delete_rows(grupo[0], grupo[-1])
-                count += len(grupo)
-            return count
-
-        excluidos["pedidos"] = delete_in_sheet('pedidos', 2)
-        excluidos["itens"] = delete_in_sheet('itens', 1)
-        excluidos["custos"] = delete_in_sheet('custos', 1)
-        try:
-            excluidos["status"] = delete_in_sheet('status', 1)
-        except: pass
+        # Linhas do pedido nas quatro abas, conferidas no Sheets numa única leitura
+        abas = ['pedidos', 'itens', 'custos', 'status']
+        linhas = order_index.rows_in(abas, nr_ped, verify=True)
+
+        # Todas as faixas (de baixo para cima) num único batchUpdate
+        batch = WriteBatch()
+        for ws_name in abas:
+            batch.delete_rows(ws_name, linhas[ws_name])
+        resultado = batch.commit()
+        excluidos = {ws_name: r["deleted"] for ws_name, r in resultado.items()}
 
         if sum(excluidos.values()) == 0:
             return jsonify({"ok": False, "msg": "Nenhum registro encontrado."})
@@ -321,11 +297,9 @@ def excluir_pedido(nr_ped):
 def pagamento_pedido(nr_ped):
     try:
         # 1. Carrega pedidos para achar o cliente
-        pedidos = db.sheets['pedidos'].get_all_records()
-        
-        # Busca o pedido de forma segura (comparando texto com texto e sem espaços)
+        # Busca o pedido pelo índice NR_PED (comparando texto com texto e sem espaços)
         nr_alvo = str(nr_ped).strip()
-        pedido = next((p for p in pedidos if str(p.get("NR_PED", "")).strip() == nr_alvo), None)
+        pedido = order_index.first_record('pedidos', nr_alvo)
         
         if not pedido:
             flash("❌ Pedido não encontrado.", "error")
@@ -361,12 +335,16 @@ def confirmar_pagamento(nr_ped):
             dt_fmt = dt_receb
 
         # Atualiza planilha
-        values = db.sheets['pedidos'].get_all_values()
-        row_indices = get_row_indices_by_col(values, 2, nr_ped)
+        row_indices = order_index.rows('pedidos', nr_ped, verify=True)
         if row_indices:
             idx = row_indices[0]
+            pedido = order_index.first_record('pedidos', nr_ped)
             # Assumindo posições fixas PAGO (col 10/J) e DT_RECEB (col 11/K)
             db.sheets['pedidos'].update(f"J{idx}:K{idx}", [["Sim", dt_fmt]], value_input_option="USER_ENTERED")
+            db.after_update('pedidos', [idx])
+            # PAGO mudou por fora da baixa FIFO: a próxima reconciliação do cliente refaz as contas
+            if pedido:
+                marcar_cliente_alterado(pedido.get("CLIENTE", ""))
             flash("💰 Pagamento confirmado!", "success")
             
         return redirect(url_for("orders.pagamento_pedido", nr_ped=nr_ped))
@@ -376,11 +354,14 @@ def confirmar_pagamento(nr_ped):
 
 @orders_bp.route("/pagamento/<nr_ped>/reverter", methods=["POST"])
 def reverter_pagamento(nr_ped):
-    values = db.sheets['pedidos'].get_all_values()
-    row_indices = get_row_indices_by_col(values, 2, nr_ped)
+    row_indices = order_index.rows('pedidos', nr_ped, verify=True)
     if row_indices:
         idx = row_indices[0]
+        pedido = order_index.first_record('pedidos', nr_ped)
         db.sheets['pedidos'].update(f"J{idx}:K{idx}", [["", ""]], value_input_option="USER_ENTERED")
+        db.after_update('pedidos', [idx])
+        if pedido:
+            marcar_cliente_alterado(pedido.get("CLIENTE", ""))
         flash("↩️ Pagamento revertido.", "success")
     return redirect(url_for("orders.pagamento_pedido", nr_ped=nr_ped))
 
@@ -388,41 +369,51 @@ def reverter_pagamento(nr_ped):
 # STATUS (HISTÓRICO) BLINDADO
 # =============================
 @orders_bp.route("/status/<nr_ped>", methods=["GET", "POST"])
+@conditional_get('cad_status', indexed=('status', 'itens'))
 def status_pedido(nr_ped):
     # --- BUSCAR HISTÓRICO COMPLETO ---
-    values = db.sheets['status'].get_all_values()
+    # Só as linhas do pedido, direto do índice NR_PED
     historico = []
     
     data_limite_obj = None
     data_limite_str = ""
     
-    for i, row in enumerate(values[1:], start=2):
-        if str(row[0]).strip() == str(nr_ped): 
-            st = row[1] if len(row) > 1 else ""
-            dt_str = row[2] if len(row) > 2 else ""
-            
-            dt_obj_row = None
-            try:
-                dt_obj_row = datetime.strptime(dt_str, "%d/%m/%Y %H:%M")
-            except: pass
-
-            # Se for o registro inicial, guarda a data limite
-            if st.lower() == "pedido registrado":
-                if dt_obj_row: 
-                    data_limite_obj = dt_obj_row
-                    data_limite_str = dt_obj_row.strftime("%Y-%m-%dT%H:%M")
-
-            historico.append({
-                "row_index": i,
-                "STATUS_HIST": st,
-                "DT_HR_STATUS": dt_str,
-                "PRAZO_STATUS": row[3] if len(row) > 3 else "",
-                "DT_HR_PRAZO": row[4] if len(row) > 4 else "",
-                "OBS_STATUS": row[5] if len(row) > 5 else "",
-                "USUARIO": row[6] if len(row) > 6 else "",
-                "DATA_HORA": row[7] if len(row) > 7 else "",
-                "DT_OBJ": dt_obj_row
-            })
+    if request.method == "GET":
+        # Histórico, cadastro de status e itens são leituras independentes: em paralelo
+        linhas_status, cad_status, itens = db.run_parallel(
+            lambda: order_index.values('status', nr_ped),
+            lambda: db.get_records('cad_status'),
+            lambda: order_index.records('itens', nr_ped),
+        )
+    else:
+        linhas_status = order_index.values('status', nr_ped)
+    
+    for i, row in linhas_status:
+        st = row[1] if len(row) > 1 else ""
+        dt_str = row[2] if len(row) > 2 else ""
+        
+        dt_obj_row = None
+        try:
+            dt_obj_row = datetime.strptime(dt_str, "%d/%m/%Y %H:%M")
+        except: pass
+
+        # Se for o registro inicial, guarda a data limite
+        if st.lower() == "pedido registrado":
+            if dt_obj_row: 
+                data_limite_obj = dt_obj_row
+                data_limite_str = dt_obj_row.strftime("%Y-%m-%dT%H:%M")
+
+        historico.append({
+            "row_index": i,
+            "STATUS_HIST": st,
+            "DT_HR_STATUS": dt_str,
+            "PRAZO_STATUS": row[3] if len(row) > 3 else "",
+            "DT_HR_PRAZO": row[4] if len(row) > 4 else "",
+            "OBS_STATUS": row[5] if len(row) > 5 else "",
+            "USUARIO": row[6] if len(row) > 6 else "",
+            "DATA_HORA": row[7] if len(row) > 7 else "",
+            "DT_OBJ": dt_obj_row
+        })
 
     historico.sort(key=lambda x: x['DT_OBJ'] or datetime.min)
 
@@ -471,24 +462,21 @@ def status_pedido(nr_ped):
                 [[novo_status, dt_str_final, prazo, dt_prazo_str, obs, session.get("usuario"), agora_str]],
                 value_input_option="USER_ENTERED"
             )
+            db.after_update('status', [int(row_index)])
         else:
-            db.sheets['status'].append_row(
-                [nr_ped, novo_status, dt_str_final, prazo, dt_prazo_str, obs, session.get("usuario"), agora_str],
-                value_input_option="USER_ENTERED"
-            )
+            status_row = [nr_ped, novo_status, dt_str_final, prazo, dt_prazo_str, obs, session.get("usuario"), agora_str]
+            resp = db.sheets['status'].append_row(status_row, value_input_option="USER_ENTERED")
+            db.after_append('status', [status_row], resp)
         
         flash("✅ Status atualizado!", "success")
         return redirect(url_for("orders.status_pedido", nr_ped=nr_ped))
 
     # --- PREPARA DADOS PARA GET ---
-    cad_status = db.sheets['cad_status'].get_all_records()
     status_options = [
         r["STATUS"] for r in cad_status 
         if r.get("STATUS") and r.get("STATUS").lower() != "pedido registrado"
     ]
     status_prazo_obrig = {r["STATUS"]: r.get("PRAZO_OBRIG", "").strip() for r in cad_status}
-    
-    itens = [i for i in db.sheets['itens'].get_all_records() if str(i.get("NR_PED")) == str(nr_ped)]
 
     return render_template(
         "status.html",
@@ -510,6 +498,7 @@ def excluir_status(nr_ped, row_index):
             flash("🚫 ERRO: Não é permitido excluir o 'Pedido Registrado'. Ele é a base do histórico.", "error")
         else:
             db.sheets['status'].delete_rows(row_index)
+            db.after_delete('status', row_index)
             flash("🗑️ Histórico excluído.", "success")
     except Exception as e:
         flash(f"Erro: {e}", "error")
@@ -518,6 +507,6 @@ def excluir_status(nr_ped, row_index):
 
 @orders_bp.route("/itens/<nr_ped>")
 def itens_pedido(nr_ped):
-    itens = [i for i in db.sheets['itens'].get_all_records() if str(i.get("NR_PED")) == str(nr_ped)]
-    custos = [c for c in db.sheets['custos'].get_all_records() if str(c.get("NR_PED")) == str(nr_ped)]
+    itens = order_index.records('itens', nr_ped)
+    custos = order_index.records('custos', nr_ped)
     return render_template("itens_pedido.html", itens=itens, custos=custos)
\ No newline at end of file
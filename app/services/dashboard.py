@@ -0,0 +1,172 @@
+# app/services/dashboard.py
+"""
+Resumo materializado do dashboard: total a receber, devedores por cliente,
+prazos (atrasados / hoje / futuros) e quantidade/valor por status.
+
+É montado uma vez a partir do índice NR_PED e depois atualizado só pelos
+pedidos que mudaram (novo pedido, edição, status, pagamento, reconciliação),
+avisados pelo order_index. Cada pedido guarda a sua contribuição, que é
+subtraída e somada de novo quando ele muda.
+
+Os prazos ficam agregados por data; as três faixas relativas a "hoje" só são
+recalculadas (a partir dessas datas, sem reler pedidos) quando o dia vira.
+"""
+import copy
+import threading
+import uuid
+from datetime import date
+from app.services.order_index import OrderView
+from app.models import Pedido
+
+
+def _contribuicao(registro):
+    """O que um registro de PEDIDOS soma no resumo (mesmas regras do dashboard)."""
+    p = Pedido.from_record(registro)
+    return {
+        "status": str(p.STATUS or "Indefinido").strip(),
+        "cliente": str(p.CLIENTE or "").strip(),
+        "val": p.valor,
+        # Entregue e não pago: entra no "a receber"
+        "receber": p.entregue and not p.pago,
+        # Prazo só conta para pedidos ainda em produção
+        "prazo": p.prazo if not p.entregue else None,
+    }
+
+
+def _faixa(prazo, hoje):
+    if prazo < hoje:
+        return "atrasados"
+    if prazo == hoje:
+        return "hoje"
+    return "futuros"
+
+
+class DashboardSummary(OrderView):
+    def _reset(self):
+        self._contrib = {}
+        self.total_receber = {"qtd": 0, "val": 0.0}
+        self.devedores = {}
+        self.resumo_status = {}
+        self.prazo_por_data = {}
+        self._dia = date.today()
+        self.prazos = self._faixas_vazias()
+
+    @staticmethod
+    def _faixas_vazias():
+        return {"atrasados": {"qtd": 0, "val": 0.0}, "hoje": {"qtd": 0, "val": 0.0}, "futuros": {"qtd": 0, "val": 0.0}}
+
+    # --- deltas ---
+    @staticmethod
+    def _somar(acc, chave, qtd, val):
+        item = acc.setdefault(chave, {"qtd": 0, "val": 0.0})
+        item["qtd"] += qtd
+        item["val"] += val
+        if item["qtd"] <= 0:
+            del acc[chave]
+
+    def _aplicar(self, c, sinal):
+        val = c["val"] * sinal
+        if c["receber"]:
+            self.total_receber["qtd"] += sinal
+            self.total_receber["val"] += val
+            self._somar(self.devedores, c["cliente"], sinal, val)
+        if c["prazo"]:
+            self._somar(self.prazo_por_data, c["prazo"], sinal, val)
+            faixa = self.prazos[_faixa(c["prazo"], self._dia)]
+            faixa["qtd"] += sinal
+            faixa["val"] += val
+        self._somar(self.resumo_status, c["status"], sinal, val)
+
+    def _substituir(self, key, registros):
+        for c in self._contrib.pop(key, []):
+            self._aplicar(c, -1)
+        novos = [_contribuicao(p) for p in registros]
+        for c in novos:
+            self._aplicar(c, +1)
+        if novos:
+            self._contrib[key] = novos
+
+    def _virar_dia(self, hoje):
+        """Recalcula só as faixas de prazo, a partir dos totais por data."""
+        self._dia = hoje
+        self.prazos = self._faixas_vazias()
+        for prazo, item in self.prazo_por_data.items():
+            faixa = self.prazos[_faixa(prazo, hoje)]
+            faixa["qtd"] += item["qtd"]
+            faixa["val"] += item["val"]
+
+    def resumo(self):
+        """Agregados atuais do dashboard (cópias, livres para edição)."""
+        self.sync()
+        with self._lock:
+            hoje = date.today()
+            if hoje != self._dia:
+                self._virar_dia(hoje)
+            return {
+                "total_receber_qtd": self.total_receber["qtd"],
+                "total_receber_val": round(self.total_receber["val"], 2),
+                "devedores": {nome: round(d["val"], 2) for nome, d in self.devedores.items()},
+                "prazos": {k: {"qtd": v["qtd"], "val": round(v["val"], 2)} for k, v in self.prazos.items()},
+                "resumo_status": {st: {"qtd": d["qtd"], "val": round(d["val"], 2)} for st, d in self.resumo_status.items()},
+            }
+
+
+class CardVersions:
+    """
+    Versões dos cards do dashboard para a API de deltas.
+    Cada atualização compara os cards com os anteriores; se algum mudou, a
+    versão global sobe e só os cards alterados (ou removidos) ficam com ela.
+    A versão vem prefixada com o id do processo: após um restart o cliente
+    recebe tudo de novo em vez de um delta inconsistente.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boot = uuid.uuid4().hex[:8]
+        self._versao = 0
+        self._cards = {}       # id -> (dados, versão em que mudou)
+        self._removidos = {}   # id -> versão em que sumiu
+
+    def _token(self, versao):
+        return f"{self._boot}-{versao}"
+
+    def atualizar(self, cards):
+        """Registra o estado atual dos cards e devolve a versão (token) correspondente."""
+        with self._lock:
+            alterados = [k for k, dados in cards.items() if k not in self._cards or self._cards[k][0] != dados]
+            sumiram = [k for k in self._cards if k not in cards]
+            if alterados or sumiram:
+                self._versao += 1
+                for k in alterados:
+                    self._cards[k] = (copy.deepcopy(cards[k]), self._versao)
+                    self._removidos.pop(k, None)
+                for k in sumiram:
+                    del self._cards[k]
+                    self._removidos[k] = self._versao
+            return self._token(self._versao)
+
+    def delta(self, since=None):
+        """{'versao', 'completo', 'cards': {id: dados}, 'removidos': [id]} desde a versão 'since'."""
+        with self._lock:
+            desde = None
+            if since:
+                boot, _, numero = str(since).partition("-")
+                if boot == self._boot and numero.isdigit() and int(numero) <= self._versao:
+                    desde = int(numero)
+            if desde is None:
+                return {
+                    "versao": self._token(self._versao),
+                    "completo": True,
+                    "cards": {k: dados for k, (dados, _) in self._cards.items()},
+                    "removidos": [],
+                }
+            return {
+                "versao": self._token(self._versao),
+                "completo": False,
+                "cards": {k: dados for k, (dados, v) in self._cards.items() if v > desde},
+                "removidos": [k for k, v in self._removidos.items() if v > desde],
+            }
+
+
+dashboard_summary = DashboardSummary()
+dashboard_cards = CardVersions()
@@ -0,0 +1,85 @@
+# app/services/detail_rows.py
+"""
+Regravação das linhas detalhe de um pedido (PEDIDOS_ITENS / PEDIDOS_CUSTOS)
+gravando só a diferença: linhas existentes são reaproveitadas na ordem e só as
+células que mudaram entram no lote; sobras viram append ou exclusão.
+"""
+import re
+from app.db import db
+from app.services.order_index import order_index, KEY_COLUMNS
+from app.services.write_batch import WriteBatch
+from app.utils import parse_float
+
+
+def get_row_indices_by_col(values, col_index, target_value):
+    indices = []
+    # Assumindo values[0] como header, dados começam em values[1] -> linha 2 do excel
+    for i, row in enumerate(values[1:], start=2):
+        val = row[col_index - 1] if col_index - 1 < len(row) else ""
+        if str(val).strip() == str(target_value):
+            indices.append(i)
+    return indices
+
+
+_NUMERICO = re.compile(r"^-?[\d.,]+$")
+
+
+def _mesmo_valor(antigo, novo):
+    """Compara o valor exibido na planilha com o do formulário ('R$ 1.234,50' == '1234,5')."""
+    a = str(antigo if antigo is not None else "").strip()
+    b = str(novo if novo is not None else "").strip()
+    if a == b:
+        return True
+    a_num = a.replace("R$", "").replace(" ", "")
+    b_num = b.replace("R$", "").replace(" ", "")
+    if _NUMERICO.match(a_num) and _NUMERICO.match(b_num):
+        return parse_float(a_num) == parse_float(b_num)
+    return False
+
+
+def _celulas_alteradas(antiga, nova, colunas_calculadas=()):
+    """
+    [(coluna, valores)] com os trechos contíguos que mudaram (colunas 1-based).
+    Colunas calculadas pela planilha são ignoradas quando o valor novo é vazio.
+    """
+    trechos = []
+    for col, valor in enumerate(nova, start=1):
+        if col in colunas_calculadas and valor in ("", None):
+            continue
+        anterior = antiga[col - 1] if col - 1 < len(antiga) else ""
+        if _mesmo_valor(anterior, valor):
+            continue
+        if trechos and trechos[-1][0] + len(trechos[-1][1]) == col:
+            trechos[-1][1].append(valor)
+        else:
+            trechos.append((col, [valor]))
+    return trechos
+
+
+def replace_detail_rows(ws, col_index, key_value, new_rows, colunas_calculadas=(), batch=None):
+    """
+    Substitui linhas detalhe (itens/custos) gravando só a diferença.
+    As linhas do pedido e seus valores vêm do índice NR_PED (sem baixar a aba inteira).
+    Estratégia:
+    1. As linhas existentes são reaproveitadas na ordem: só as células que mudaram são regravadas.
+    2. Sobrou linha nova: entra no final. Sobrou linha antiga: é excluída.
+    Com 'batch', as escritas entram no lote do chamador (que faz o commit).
+    """
+    name = db.sheet_name(ws)
+    if KEY_COLUMNS.get(name) == col_index:
+        row_indices = order_index.rows(name, key_value, verify=True)
+        antigas = dict(order_index.values(name, key_value))
+    else:
+        values = ws.get_all_values()
+        row_indices = get_row_indices_by_col(values, col_index, key_value)
+        antigas = {r: values[r - 1] for r in row_indices}
+
+    lote = batch or WriteBatch()
+    comuns = min(len(row_indices), len(new_rows))
+    for row_index, nova in zip(row_indices[:comuns], new_rows[:comuns]):
+        for col, valores in _celulas_alteradas(antigas.get(row_index, []), nova, colunas_calculadas):
+            lote.update_cells(name, row_index, col, valores)
+    lote.append(name, new_rows[comuns:])
+    lote.delete_rows(name, row_indices[comuns:])
+    if batch is None:
+        lote.commit()
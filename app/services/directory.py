@@ -0,0 +1,119 @@
+# app/services/directory.py
+"""
+Diretório de clientes e produtos com listas já ordenadas, compartilhado pelas
+telas de pedido e pelo financeiro.
+
+- Clientes e produtos do cadastro: recalculados só quando o cache da aba
+  recebe dados novos (db.generation muda); fora isso, nenhuma leitura.
+- Clientes com pedido (coluna C de PEDIDOS, usado no financeiro): contagem por
+  cliente mantida por deltas do índice NR_PED, sem baixar a coluna a cada clique.
+
+Cada lista tem uma versão que só muda quando o conteúdo muda.
+"""
+import threading
+from app.db import db
+from app.services.order_index import OrderView
+
+
+class CatalogList:
+    """Lista derivada de uma aba de cadastro, refeita só quando o cache da aba muda."""
+
+    def __init__(self, name, build):
+        self.name = name
+        self._build = build
+        self._lock = threading.Lock()
+        self._generation = None
+        self.items = []
+        self.version = 0
+
+    def get(self):
+        with self._lock:
+            # get_values() só vai à rede se o cache da aba expirou
+            values = db.get_values(self.name)
+            generation = db.generation(self.name)
+            if generation != self._generation:
+                items = self._build(db.to_records(values))
+                if items != self.items:
+                    self.items = items
+                    self.version += 1
+                self._generation = generation
+            return self.items
+
+
+def _nomes_clientes(registros):
+    return sorted(c.get("NOME_CLI") for c in registros if c.get("NOME_CLI"))
+
+
+def _lista_produtos(registros):
+    return sorted(
+        [{"PRODUTO": p.get("PRODUTO"), "VLR_CAT": p.get("VLR_CAT")} for p in registros if p.get("PRODUTO")],
+        key=lambda x: x["PRODUTO"]
+    )
+
+
+class ClientesComPedido(OrderView):
+    """Clientes distintos da coluna CLIENTE de PEDIDOS, mantidos por deltas."""
+
+    # Nome do cliente não depende de itens/custos/status
+    watch_dependents = False
+
+    def _reset(self):
+        self._cliente_por_pedido = {}
+        self._contagem = {}
+        self._ordenados = None
+        self.version = getattr(self, "version", 0) + 1
+
+    def _substituir(self, key, registros):
+        antigos = self._cliente_por_pedido.pop(key, [])
+        novos = [str(p.get("CLIENTE") or "").strip() for p in registros]
+        novos = [c for c in novos if c]
+        if antigos == novos:
+            if novos:
+                self._cliente_por_pedido[key] = novos
+            return
+        for c in antigos:
+            self._contagem[c] -= 1
+            if not self._contagem[c]:
+                del self._contagem[c]
+                self._ordenados = None
+        for c in novos:
+            if c not in self._contagem:
+                self._ordenados = None
+            self._contagem[c] = self._contagem.get(c, 0) + 1
+        if novos:
+            self._cliente_por_pedido[key] = novos
+        if self._ordenados is None:
+            self.version += 1
+
+    def lista(self):
+        self.sync()
+        with self._lock:
+            if self._ordenados is None:
+                self._ordenados = sorted(self._contagem)
+            return list(self._ordenados)
+
+
+class Directory:
+    def __init__(self):
+        self._clientes = CatalogList('clientes', _nomes_clientes)
+        self._produtos = CatalogList('produtos', _lista_produtos)
+        self._clientes_pedidos = ClientesComPedido()
+
+    def clientes(self):
+        """Nomes de CLIENTES, ordenados."""
+        return list(self._clientes.get())
+
+    def produtos(self):
+        """[{'PRODUTO', 'VLR_CAT'}] de PRODUTOS, ordenados por produto."""
+        return [dict(p) for p in self._produtos.get()]
+
+    def clientes_com_pedido(self):
+        """Clientes distintos que aparecem em PEDIDOS, ordenados (dropdown do financeiro)."""
+        return self._clientes_pedidos.lista()
+
+    def version(self):
+        """Muda sempre que alguma das listas muda de conteúdo."""
+        return (self._clientes.version, self._produtos.version, self._clientes_pedidos.version)
+
+
+directory = Directory()
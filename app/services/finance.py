@@ -1,197 +1,209 @@
 # app/services/finance.py
 from app.db import db
-from datetime import datetime
-import re
-import unicodedata
+from app.models import Pedido, Pagamento
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+from datetime import date
+import hashlib
+import threading
+
+# Assinatura (hash) do estado de cada cliente logo após a última reconciliação.
+# Se pagamentos e pedidos entregues do cliente não mudaram desde então, não há o que baixar.
+_assinaturas = {}
+_assinaturas_lock = threading.Lock()
+
+def _assinatura(pagamentos_cliente, pedidos):
+    """Hash do que importa para a baixa: pagamentos do cliente e pedidos entregues (linha, valor, PAGO)."""
+    estado = (
+        sorted(pagamentos_cliente),
+        [(p['row_index'], p['id_num'], p['dt_entreg'], p['valor'], p['status_pago_atual']) for p in pedidos],
+    )
+    return hashlib.sha1(repr(estado).encode("utf-8")).hexdigest()
+
+def marcar_cliente_alterado(cliente_nome=None):
+    """Força a próxima reconciliação do cliente (ou de todos, sem argumento)."""
+    with _assinaturas_lock:
+        if cliente_nome is None:
+            _assinaturas.clear()
+        else:
+            _assinaturas.pop(str(cliente_nome).strip(), None)
+
+# Só as colunas usadas aqui, pelo nome no cabeçalho (a posição na planilha pode mudar)
+COLS_PEDIDOS = ['STATUS', 'NR_PED', 'CLIENTE', 'PACIENTE', 'DT_ENTREG', 'VLR_PED', 'PAGO']
+COLS_PAGAMENTOS = ['CLIENTE', 'DT_RECEB', 'VLR_RECEB', 'OBS']
 
-def safe_float(value):
+def _ler_financeiro():
     """
-    Converte valores monetários para float de forma SUPER segura.
-    Remove R$, espaços normais e espaços invisíveis (nbsp).
+    (pagamentos, pedidos) tipados, a partir das colunas projetadas, lidas num
+    único batchGet quando não estão no cache. Valores, datas e PAGO já vêm
+    convertidos e são reaproveitados enquanto os dados não mudam.
     """
-    if isinstance(value, (int, float)):
-        return float(value)
-    if not value:
-        return 0.0
-    
-    # Normaliza para remover caracteres estranhos e converte para string
-    text = str(value)
-    # Remove R$ e normaliza espaços (incluindo \xa0 que é comum em planilhas)
-    text = unicodedata.normalize("NFKD", text).replace("R$", "").replace(" ", "")
-    
-    # Troca pontuação brasileira
-    text = text.replace(".", "").replace(",", ".")
-    
-    try:
-        return float(text)
-    except ValueError:
-        return 0.0
-
-def safe_int_id(value):
-    """Extrai o número do ID (ex: '#088' -> 88)."""
-    if isinstance(value, int):
-        return value
-    if not value:
-        return 0
-    clean = re.sub(r'\D', '', str(value))
-    try:
-        return int(clean)
-    except ValueError:
-        return 0
-
-def smart_date_parse(dt_str):
-    """Tenta converter a data de vários formatos."""
-    if not dt_str:
-        return datetime.min
-    
-    dt_str = str(dt_str).strip()
-    formats = ['%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%Y']
-    
-    for fmt in formats:
-        try:
-            return datetime.strptime(dt_str, fmt)
-        except ValueError:
-            continue
-            
-    return datetime.min
+    dados = db.get_columns_many({'pagamentos': COLS_PAGAMENTOS, 'pedidos': COLS_PEDIDOS})
+    return Pagamento.lista(dados['pagamentos']), Pedido.lista(dados['pedidos'])
+
+def _pagamentos_por_cliente(pagamentos):
+    """Uma passada por PEDIDOS_PGTOS: {cliente: (total_pago, [(data, valor), ...])}."""
+    totais, listas = {}, {}
+    for pg in pagamentos:
+        totais[pg.cliente] = totais.get(pg.cliente, 0.0) + pg.valor
+        listas.setdefault(pg.cliente, []).append((str(pg.DT_RECEB), str(pg.VLR_RECEB)))
+    return {cliente: (totais[cliente], listas[cliente]) for cliente in totais}
+
+def _entregues_por_cliente(pedidos):
+    """Uma passada por PEDIDOS: {cliente: [pedidos entregues, na ordem da baixa FIFO]}."""
+    grupos = {}
+    for p in pedidos:
+        if p.entregue:
+            grupos.setdefault(str(p.CLIENTE).strip(), []).append({
+                'row_index': p.row_index,
+                'id_num': p.nr_num,
+                'dt_entreg': p.DT_ENTREG,
+                'entrega': p.entrega or date.min,
+                'valor': p.valor,
+                'status_pago_atual': str(p.PAGO).strip().upper()
+            })
 
-def reconciliar_pagamentos(cliente_nome):
+    # ORDENAÇÃO: Data Entrega Crescente (Mais antigo primeiro) -> ID Crescente
+    for lista in grupos.values():
+        lista.sort(key=lambda x: (x['entrega'], x['id_num']))
+    return grupos
+
+def _baixa_fifo(pedidos, total_pago):
+    """([pago?] na ordem FIFO, saldo restante): o laço de baixa, pedido a pedido."""
+    saldo = total_pago
+    pagos = []
+    for pedido in pedidos:
+        if saldo >= pedido['valor'] - 0.01:
+            # TEM SALDO -> PAGA
+            pagos.append(True)
+            saldo -= pedido['valor']
+        else:
+            # ACABOU O SALDO -> LIMPA
+            pagos.append(False)
+            saldo = 0
+    return pagos, saldo
+
+def _baixa_cliente(cliente_nome, total_pago, pagamentos_cliente, pedidos_para_processar, forcar):
     """
-    Lógica FIFO (First-In, First-Out) com índices corrigidos e limpeza forçada.
+    Baixa FIFO de um cliente, sem gravar nada.
+    Retorna (resultado, updates, assinatura_pos_baixa); updates=None se nada mudou desde a última baixa.
     """
-    ws_pagamentos = db.get_ws('pagamentos')
-    ws_pedidos = db.get_ws('pedidos')
-    
-    # 1. Calcular Saldo Total Pago
-    pagamentos = ws_pagamentos.get_all_values() # Usando get_all_values para segurança
-    total_pago = 0.0
-    
-    # Índices Pagamento: A=0(Cliente), B=1(Dt), C=2(Valor)
-    for row in pagamentos[1:]:
-        if len(row) > 2 and str(row[0]).strip() == cliente_nome:
-            total_pago += safe_float(row[2])
-    
-    saldo_para_baixar = total_pago
-
-    # 2. Ler Pedidos
-    rows = ws_pedidos.get_all_values()
-    
-    # === ÍNDICES CORRIGIDOS PELO PRINT DA PLANILHA ===
-    IDX_STATUS = 0     # A: Status
-    IDX_ID = 1         # B: NR_PED
-    IDX_CLIENTE = 2    # C: Cliente
-    IDX_DT_ENTREG = 6  # G: DT_ENTREG (Antes estava 4/E errado)
-    IDX_VALOR = 7      # H: VLR_PED
-    IDX_PAGO = 8       # I: PAGO
-
-    pedidos_para_processar = []
-
-    for i, row in enumerate(rows[1:], start=2):
-        if len(row) <= IDX_PAGO: continue 
-        
-        row_cliente = str(row[IDX_CLIENTE]).strip()
-        row_status = str(row[IDX_STATUS]).strip().upper()
-        
-        if row_cliente == cliente_nome and row_status == 'ENTREGUE':
-            pedidos_para_processar.append({
-                'row_index': i,
-                'id_num': safe_int_id(row[IDX_ID]),
-                'dt_entreg': row[IDX_DT_ENTREG],
-                'valor': safe_float(row[IDX_VALOR]),
-                'status_pago_atual': str(row[IDX_PAGO]).strip().upper()
-            })
+    # Nada mudou desde a última baixa: o saldo já está aplicado na planilha
+    assinatura = _assinatura(pagamentos_cliente, pedidos_para_processar)
+    with _assinaturas_lock:
+        inalterado = _assinaturas.get(cliente_nome) == assinatura
+    if inalterado and not forcar:
+        # Mesmo saldo que a baixa daria
+        _, saldo = _baixa_fifo(pedidos_para_processar, total_pago)
+        return {
+            "total_pago": total_pago,
+            "saldo_restante": saldo,
+            "reconciliado": False
+        }, None, assinatura
 
-    # 3. ORDENAÇÃO: Data Entrega Crescente (Mais antigo primeiro) -> ID Crescente
-    pedidos_para_processar.sort(key=lambda x: (smart_date_parse(x['dt_entreg']), x['id_num']))
+    pagos, saldo_para_baixar = _baixa_fifo(pedidos_para_processar, total_pago)
 
+    # Aplica a baixa: grava só as células de PAGO que realmente mudam
+    col_pago = db.resolve_columns('pedidos', ['PAGO'])[0]
     updates = [] 
+    for pago, pedido in zip(pagos, pedidos_para_processar):
+        novo = "SIM" if pago else ""
+        if pedido['status_pago_atual'] != novo:
+            updates.append({'range': rowcol_to_a1(pedido['row_index'], col_pago), 'values': [[novo]]})
+        pedido['status_pago_atual'] = novo
 
-    # 4. Aplica a baixa
-    for pedido in pedidos_para_processar:
-        valor_pedido = pedido['valor']
-        row_idx = pedido['row_index']
-        
-        # Se o valor for 0 (erro de leitura), forçamos log para debug (opcional)
-        # mas a lógica segue.
-        
-        if saldo_para_baixar >= (valor_pedido - 0.01):
-            # TEM SALDO -> PAGA
-            if pedido['status_pago_atual'] != "SIM":
-                 updates.append({'range': f'I{row_idx}', 'values': [['SIM']]})
-            
-            saldo_para_baixar -= valor_pedido
-        else:
-            # ACABOU O SALDO -> LIMPA
-            # Removemos a verificação "if != ''". 
-            # Mandamos limpar SEMPRE se não tiver saldo, para garantir.
-            updates.append({'range': f'I{row_idx}', 'values': [['']]})
-            
-            saldo_para_baixar = 0
-    
-    # 5. Executa atualização em lote
+    resultado = {
+        "total_pago": total_pago,
+        "saldo_restante": saldo_para_baixar,
+        "reconciliado": True
+    }
+    return resultado, updates, _assinatura(pagamentos_cliente, pedidos_para_processar)
+
+def _gravar_baixas(updates, assinaturas):
+    """Envia todas as alterações de PAGO num único batch_update e guarda o estado pós-baixa."""
     if updates:
         try:
-            ws_pedidos.batch_update(updates)
+            db.get_ws('pedidos').batch_update(updates)
+            db.after_update('pedidos', [a1_to_rowcol(u['range'])[0] for u in updates])
         except Exception as e:
             print(f"Erro update: {e}")
-        
+            return False
+
+    # Guarda o estado já com a baixa aplicada: a próxima visita sem mudanças não grava nada
+    with _assinaturas_lock:
+        _assinaturas.update(assinaturas)
+    return True
+
+def reconciliar_pagamentos(cliente_nome, forcar=False):
+    """
+    Lógica FIFO (First-In, First-Out) com índices corrigidos; grava só as células de PAGO que mudam.
+    Só grava se pagamentos ou pedidos entregues do cliente mudaram desde a última
+    reconciliação (ou com forcar=True).
+    """
+    pagamentos, rows = _ler_financeiro()
+
+    # 1. Calcular Saldo Total Pago
+    total_pago, pagamentos_cliente = _pagamentos_por_cliente(pagamentos).get(cliente_nome, (0.0, []))
+
+    # 2. Pedidos entregues do cliente
+    pedidos_para_processar = _entregues_por_cliente(rows).get(cliente_nome, [])
+
+    # 3. Baixa FIFO
+    resultado, updates, assinatura = _baixa_cliente(
+        cliente_nome, total_pago, pagamentos_cliente, pedidos_para_processar, forcar
+    )
+
+    # 4. Executa atualização em lote
+    if updates is not None:
+        _gravar_baixas(updates, {cliente_nome: assinatura})
+    return resultado
+
+def reconciliar_todos(forcar=False):
+    """
+    Reconcilia todos os clientes de uma vez: lê PEDIDOS_PGTOS e PEDIDOS (só as
+    colunas usadas) uma única vez, agrupa por cliente, roda a baixa FIFO de cada um e envia todas
+    as alterações de PAGO num único batch_update.
+    """
+    rows_pgtos, rows = _ler_financeiro()
+    pagamentos = _pagamentos_por_cliente(rows_pgtos)
+    entregues = _entregues_por_cliente(rows)
+
+    updates, assinaturas, resultados = [], {}, {}
+    for cliente in sorted(set(pagamentos) | set(entregues)):
+        if not cliente:
+            continue
+        total_pago, pagamentos_cliente = pagamentos.get(cliente, (0.0, []))
+        resultado, updates_cliente, assinatura = _baixa_cliente(
+            cliente, total_pago, pagamentos_cliente, entregues.get(cliente, []), forcar
+        )
+        resultados[cliente] = resultado
+        if updates_cliente is not None:
+            updates.extend(updates_cliente)
+            assinaturas[cliente] = assinatura
+
+    gravado = _gravar_baixas(updates, assinaturas)
     return {
-        "total_pago": total_pago,
-        "saldo_restante": saldo_para_baixar
+        "clientes": len(resultados),
+        "reconciliados": len(assinaturas),
+        "celulas_alteradas": len(updates) if gravado else 0,
+        "gravado": gravado,
+        "resultados": resultados,
     }
 
 def buscar_extrato_cliente(cliente_nome):
-    ws_pagamentos = db.get_ws('pagamentos')
-    ws_pedidos = db.get_ws('pedidos')
-
-    # Pagamentos
-    rows_pgtos = ws_pagamentos.get_all_values()
-    pgtos_cliente = []
-    
-    for i, row in enumerate(rows_pgtos[1:], start=2):
-        if len(row) > 2 and str(row[0]).strip() == cliente_nome:
-            pgtos_cliente.append({
-                'row_index': i,
-                'DT_RECEB': row[1],
-                'VLR_RECEB': row[2],
-                'OBS': row[3] if len(row) > 3 else ""
-            })
-    pgtos_cliente.sort(key=lambda x: smart_date_parse(x['DT_RECEB']), reverse=True)
-
-    # Pedidos
-    rows = ws_pedidos.get_all_values()
-    
-    # Índices iguais ao reconciliar
-    IDX_STATUS = 0
-    IDX_ID = 1
-    IDX_CLIENTE = 2
-    IDX_PACIENTE = 3
-    IDX_DT_ENTREG = 6 # Corrigido para G
-    IDX_VALOR = 7
-    IDX_PAGO = 8
-
-    pedidos_cliente = []
-    
-    for row in rows[1:]:
-        if len(row) <= IDX_PAGO: continue 
-
-        row_cliente = str(row[IDX_CLIENTE]).strip()
-        row_status = str(row[IDX_STATUS]).strip().upper()
-
-        if row_cliente == cliente_nome and row_status == 'ENTREGUE':
-            pedidos_cliente.append({
-                'NR_PED': row[IDX_ID],
-                'PACIENTE': row[IDX_PACIENTE],
-                'DT_ENTREG': row[IDX_DT_ENTREG], # Usa Data Entrega correta
-                'VLR_PED': row[IDX_VALOR],
-                'PAGO': row[IDX_PAGO] if len(row) > IDX_PAGO else ""
-            })
+    pagamentos, pedidos = _ler_financeiro()
+
+    # Pagamentos (registros tipados: row_index, DT_RECEB, VLR_RECEB, OBS)
+    pgtos_cliente = [pg for pg in pagamentos if pg.cliente == cliente_nome]
+    pgtos_cliente.sort(key=lambda pg: pg.data or date.min, reverse=True)
+
+    # Pedidos entregues do cliente (NR_PED, PACIENTE, DT_ENTREG, VLR_PED, PAGO)
+    pedidos_cliente = [p for p in pedidos if p.entregue and str(p.CLIENTE).strip() == cliente_nome]
 
     # Ordena Visualização (Mais novo em cima)
-    pedidos_cliente.sort(key=lambda x: (smart_date_parse(x['DT_ENTREG']), safe_int_id(x['NR_PED'])), reverse=True)
+    pedidos_cliente.sort(key=lambda p: (p.entrega or date.min, p.nr_num), reverse=True)
 
-    total_divida = sum(safe_float(p['VLR_PED']) for p in pedidos_cliente)
-    total_pago = sum(safe_float(p.get('VLR_RECEB')) for p in pgtos_cliente)
+    total_divida = sum(p.valor for p in pedidos_cliente)
+    total_pago = sum(pg.valor for pg in pgtos_cliente)
 
     return {
         "pedidos": pedidos_cliente,
@@ -201,4 +213,4 @@ def buscar_extrato_cliente(cliente_nome):
             "total_pago": total_pago,
             "saldo_pendente": total_divida - total_pago
         }
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,114 @@
+# app/services/order_filter.py
+"""
+Motor de filtros das telas de detalhes (/detalhes/<tipo>/<filtro>, /areceber).
+
+Os pedidos viram listas de posições (índice do pedido na lista, em ordem
+crescente = ordem da planilha) montadas numa única passada: uma por status, por
+slug e por dia de prazo (só pedidos não entregues), mais não entregues e a
+receber. Cada filtro devolve uma dessas listas já pronta, ou intercala as
+listas dos dias de prazo da faixa; o custo é proporcional ao número de pedidos
+selecionados, sem percorrer todos os pedidos.
+
+As faixas de prazo relativas a hoje saem de uma busca binária nos dias com
+prazo (atrasados = dias antes de hoje), então a virada do dia não exige
+remontar nada.
+
+As listas são montadas uma vez por lista de pedidos (a lista tipada é a mesma
+enquanto os dados não mudam) e reaproveitadas entre requisições.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+from app.utils import norm_status
+
+
+class OrderColumns:
+    def __init__(self, pedidos):
+        self.pedidos = pedidos
+
+        # Posições dos pedidos (crescentes) por critério
+        self.por_status = {}        # status normalizado -> [i]
+        self.por_slug = {}          # slug -> [i]
+        self.nao_entregues = []
+        self.a_receber = []         # entregues e não pagos
+        prazo_por_dia = {}          # ordinal -> [i] (só não entregues)
+
+        for i, p in enumerate(pedidos):
+            self.por_status.setdefault(p.status, []).append(i)
+            self.por_slug.setdefault(p.status_slug, []).append(i)
+            if p.entregue:
+                if not p.pago:
+                    self.a_receber.append(i)
+                continue
+            self.nao_entregues.append(i)
+            if p.prazo:
+                prazo_por_dia.setdefault(p.prazo.toordinal(), []).append(i)
+
+        # Posições agrupadas por dia de prazo, dias em ordem: _inicio[k] = onde começa o dia _dias[k]
+        self._dias = sorted(prazo_por_dia)
+        self._por_prazo = []
+        self._inicio = []
+        for dia in self._dias:
+            self._inicio.append(len(self._por_prazo))
+            self._por_prazo.extend(prazo_por_dia[dia])
+        self._inicio.append(len(self._por_prazo))
+
+    # --- faixas de prazo ---
+    def _dias_entre(self, inicio, fim):
+        """Posições dos pedidos com prazo nos dias _dias[inicio:fim], na ordem da planilha."""
+        # O trecho é uma sequência de listas já ordenadas (uma por dia): o sort só as intercala
+        return sorted(self._por_prazo[self._inicio[inicio]:self._inicio[fim]])
+
+    def prazo_antes(self, hoje):
+        return self._dias_entre(0, bisect_left(self._dias, hoje.toordinal()))
+
+    def prazo_em(self, hoje):
+        return self._dias_entre(bisect_left(self._dias, hoje.toordinal()), bisect_right(self._dias, hoje.toordinal()))
+
+    def prazo_depois(self, hoje):
+        return self._dias_entre(bisect_right(self._dias, hoje.toordinal()), len(self._dias))
+
+    def posicoes(self, tipo, filtro, hoje=None):
+        """Posições dos pedidos da view tipo/filtro (mesmas regras de /detalhes); None = todos."""
+        hoje = hoje or date.today()
+        if tipo == "prazo":
+            if filtro == "atrasados":
+                return self.prazo_antes(hoje)
+            if filtro == "hoje":
+                return self.prazo_em(hoje)
+            if filtro in {"futuro", "futuros"}:
+                return self.prazo_depois(hoje)
+            return []
+        if tipo == "status":
+            return self.por_status.get(norm_status(filtro), [])
+        if tipo == "receber":
+            return self.a_receber
+        if tipo == "porcliente":
+            if filtro == "todos":
+                return None
+            if filtro == "naoentregues":
+                return self.nao_entregues
+            return []
+        if tipo == "porstatus":
+            return self.por_slug.get(filtro.lower(), [])
+        return []
+
+    def select(self, tipo, filtro, hoje=None):
+        """Pedidos da view, na ordem da planilha."""
+        posicoes = self.posicoes(tipo, filtro, hoje)
+        if posicoes is None:
+            return list(self.pedidos)
+        pedidos = self.pedidos
+        return [pedidos[i] for i in posicoes]
+
+
+_colunas = {"pedidos": None, "colunas": None}
+_colunas_lock = threading.Lock()
+
+
+def colunas_pedidos(pedidos):
+    """OrderColumns da lista de pedidos, remontado só quando a lista muda."""
+    with _colunas_lock:
+        if _colunas["pedidos"] is not pedidos:
+            _colunas.update(pedidos=pedidos, colunas=OrderColumns(pedidos))
+        return _colunas["colunas"]
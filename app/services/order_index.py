@@ -0,0 +1,484 @@
+# app/services/order_index.py
+"""
+Índice em memória NR_PED -> linhas das abas de pedidos (PEDIDOS, PEDIDOS_ITENS,
+PEDIDOS_CUSTOS e PEDIDOS_STATUS).
+
+O índice é montado a partir de um snapshot (uma leitura em lote das quatro abas)
+e depois mantido por deltas a cada append/update/delete feito pelo app, via
+db.add_listener. Assim, telas e edições de um único pedido não precisam baixar
+e varrer a aba inteira.
+
+Linhas alteradas ou recém-anexadas ficam "sem valor" no índice e são relidas
+sob demanda, só elas, com um batchGet dos intervalos da linha (as abas têm
+colunas calculadas por fórmula, então o que foi escrito não é o que o Sheets exibe).
+
+As leituras no Sheets (snapshot, linhas, conferência da chave) são feitas fora
+do lock: ele só protege a consulta e a troca dos dados. Se uma escrita chega
+durante a leitura, o resultado é descartado e a leitura refeita.
+"""
+import abc
+import threading
+import time
+from gspread.utils import absolute_range_name, rowcol_to_a1
+from app.db import db, DEPENDENT_SHEETS
+
+# Coluna (1 = A) onde fica o NR_PED em cada aba
+KEY_COLUMNS = {
+    'pedidos': 2,
+    'itens': 1,
+    'custos': 1,
+    'status': 1,
+}
+
+# Mesmo com deltas, o índice é remontado periodicamente para absorver edições feitas
+# direto na planilha (ou pelo bot) que deslocam linhas.
+INDEX_MAX_AGE = 300
+
+
+def normalize_key(value):
+    """NR_PED como texto sem espaços ('12', 12 e ' 12 ' viram '12')."""
+    return str(value if value is not None else "").strip()
+
+
+def _row_groups(row_numbers):
+    """[2, 3, 4, 8] -> [(2, 4), (8, 8)]"""
+    groups = []
+    for row in sorted(set(row_numbers)):
+        if groups and row == groups[-1][1] + 1:
+            groups[-1] = (groups[-1][0], row)
+        else:
+            groups.append((row, row))
+    return groups
+
+
+class SheetIndex:
+    """Índice de uma aba: NR_PED -> números de linha, e linha -> valores brutos (ou None se desatualizado)."""
+
+    def __init__(self, name, key_col):
+        self.name = name
+        self.key_col = key_col
+        self.header = []
+        self.rows_by_key = {}
+        self.key_by_row = {}
+        self.values_by_row = {}
+        self.last_row = 1
+        self.generation = -1
+        self.built_at = 0.0
+        self.stale = True
+
+    def build(self, values, generation):
+        self.header = list(values[0]) if values else []
+        self.rows_by_key = {}
+        self.key_by_row = {}
+        self.values_by_row = {}
+        for row_number, row in enumerate(values[1:], start=2):
+            key = normalize_key(row[self.key_col - 1]) if len(row) >= self.key_col else ""
+            if not key:
+                continue
+            self.rows_by_key.setdefault(key, []).append(row_number)
+            self.key_by_row[row_number] = key
+            self.values_by_row[row_number] = row
+        self.last_row = max(len(values), 1)
+        self.generation = generation
+        self.built_at = time.monotonic()
+        self.stale = False
+
+    # --- deltas ---
+    def on_append(self, start_row, rows):
+        if start_row is None or start_row != self.last_row + 1:
+            # Sem a faixa gravada não dá para saber onde as linhas foram parar; depois
+            # de uma lacuna, alguém anexou por fora (bot, edição manual) e o índice não confere
+            self.stale = True
+            return set()
+        keys = set()
+        for offset, row in enumerate(rows):
+            row_number = start_row + offset
+            key = normalize_key(row[self.key_col - 1]) if len(row) >= self.key_col else ""
+            if key:
+                self.rows_by_key.setdefault(key, []).append(row_number)
+                self.key_by_row[row_number] = key
+                self.values_by_row[row_number] = None
+                keys.add(key)
+        self.last_row = max(self.last_row, start_row + len(rows) - 1)
+        return keys
+
+    def on_update(self, row_numbers):
+        keys = set()
+        for row_number in row_numbers:
+            if row_number in self.key_by_row:
+                self.values_by_row[row_number] = None
+                keys.add(self.key_by_row[row_number])
+        return keys
+
+    def on_delete(self, start, end):
+        # As linhas abaixo do trecho removido sobem 'removed' posições
+        removed = end - start + 1
+        keys = set()
+        rows_by_key, key_by_row, values_by_row = {}, {}, {}
+        for row_number, key in self.key_by_row.items():
+            if start <= row_number <= end:
+                keys.add(key)
+                continue
+            new_number = row_number - removed if row_number > end else row_number
+            rows_by_key.setdefault(key, []).append(new_number)
+            key_by_row[new_number] = key
+            values_by_row[new_number] = self.values_by_row.get(row_number)
+        for rows in rows_by_key.values():
+            rows.sort()
+        self.rows_by_key = rows_by_key
+        self.key_by_row = key_by_row
+        self.values_by_row = values_by_row
+        self.last_row = max(self.last_row - removed, 1)
+        return keys
+
+    def mark_dirty(self, key):
+        for row_number in self.rows_by_key.get(key, []):
+            self.values_by_row[row_number] = None
+
+
+class OrderIndex:
+    def __init__(self):
+        self._indexes = {name: SheetIndex(name, col) for name, col in KEY_COLUMNS.items()}
+        self._lock = threading.RLock()
+        self._listeners = []
+        # Contador de mudanças por aba (deltas e remontagens), base do data_version()
+        self._changes = {name: 0 for name in self._indexes}
+        db.add_listener(self._on_write)
+
+    def add_listener(self, callback):
+        """
+        Registra callback(nome_aba, chaves) chamado quando pedidos mudam:
+        'chaves' é o conjunto de NR_PED afetados, ou None quando a aba foi remontada inteira.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, name, keys):
+        for callback in list(self._listeners):
+            try:
+                callback(name, keys)
+            except Exception as e:
+                print(f"⚠️ [INDEX] Falha ao avisar mudança em '{name}': {e}")
+
+    # --- montagem ---
+    @staticmethod
+    def _expired(index):
+        return index.stale or time.monotonic() - index.built_at > INDEX_MAX_AGE
+
+    def _ensure(self, name):
+        """Índice da aba em dia. Não chame segurando o lock: o snapshot é baixado fora dele."""
+        while True:
+            with self._lock:
+                index = self._indexes[name]
+                if not self._expired(index):
+                    if index.generation != db.generation(name) and db.cached_values(name) is not None:
+                        # O cache recebeu dados novos do Sheets: remonta em memória, sem rede
+                        self._rebuild(name)
+                    return index
+                # Remonta todas as abas pendentes com um único snapshot (mesma planilha)
+                pendentes = [n for n, idx in self._indexes.items() if self._expired(idx)]
+                mudancas = {n: self._changes[n] for n in pendentes}
+
+            valores = db.snapshot_values(pendentes)
+
+            with self._lock:
+                for n in pendentes:
+                    # Escrita ou remontagem durante o download: o snapshot pode não tê-la visto
+                    if self._changes[n] != mudancas[n] or not self._expired(self._indexes[n]):
+                        continue
+                    # O cache pode ter recebido algo mais novo enquanto isso
+                    atual = db.cached_values(n)
+                    self._rebuild(n, atual if atual is not None else valores[n])
+
+    def _rebuild(self, name, values=None):
+        index = self._indexes[name]
+        if values is None:
+            values = db.cached_values(name)
+        if values is None:
+            values = db.get_values(name)
+        index.build(values, db.generation(name))
+        self._changes[name] += 1
+        self._notify(name, None)
+
+    def invalidate(self, *names):
+        """Força a remontagem no próximo acesso (ex: planilha editada fora do app)."""
+        with self._lock:
+            for name in names or self._indexes:
+                self._indexes[name].stale = True
+                self._changes[name] += 1
+
+    def data_version(self, names):
+        """
+        Token do estado do índice das abas, sem acessar a rede. None se o próximo
+        acesso remontaria algum índice (expirado, marcado ou com dados novos no cache).
+        """
+        with self._lock:
+            token = []
+            for name in names:
+                index = self._indexes[name]
+                if index.stale or time.monotonic() - index.built_at > INDEX_MAX_AGE:
+                    return None
+                if index.generation != db.generation(name) and db.cached_values(name) is not None:
+                    return None
+                token.append((name, self._changes[name]))
+            return tuple(token)
+
+    def refresh(self, name):
+        """Garante o índice em dia (remonta se expirou ou se o cache trouxe dados novos)."""
+        self._ensure(name)
+
+    # --- consultas ---
+    def last_row(self, name):
+        """Última linha com dados na aba, segundo o índice (mantida pelos deltas de escrita)."""
+        index = self._ensure(name)
+        with self._lock:
+            return index.last_row
+
+    def keys(self, name):
+        """Todos os NR_PED presentes na aba."""
+        index = self._ensure(name)
+        with self._lock:
+            return list(index.rows_by_key)
+
+    def rows(self, name, nr_ped, verify=False):
+        """Números das linhas do pedido na aba. verify=True confere a coluna-chave no Sheets antes de uma escrita."""
+        return self.rows_in([name], nr_ped, verify=verify)[name]
+
+    def rows_in(self, names, nr_ped, verify=False):
+        """
+        {aba: linhas do pedido} em várias abas. Com verify=True, as colunas-chave
+        de todas as abas são conferidas num único batchGet por planilha.
+        """
+        key = normalize_key(nr_ped)
+        while True:
+            for name in names:
+                self._ensure(name)
+            with self._lock:
+                result = {name: list(self._indexes[name].rows_by_key.get(key, [])) for name in names}
+                mudancas = {name: self._changes[name] for name in names}
+            if not verify:
+                return result
+
+            ruins = self._mismatched(key, result)
+
+            with self._lock:
+                mudou = any(self._changes[name] != mudancas[name] for name in names)
+            for name in ruins:
+                print(f"⚠️ [INDEX] Linhas de '{name}' deslocadas na planilha. Remontando índice.")
+                db.invalidate(name)
+                self.invalidate(name)
+            if not ruins and not mudou:
+                return result
+            # Abas remontadas vêm do Sheets e dispensam nova conferência; se só houve
+            # escrita do app durante a leitura, confere de novo
+            verify = not ruins
+
+    def values(self, name, nr_ped):
+        """[(número_da_linha, valores_brutos)] do pedido, relendo só as linhas desatualizadas."""
+        key = normalize_key(nr_ped)
+        return self._with_rows(name, [key], lambda index: [
+            (r, index.values_by_row.get(r) or []) for r in index.rows_by_key.get(key, [])
+        ])
+
+    def records(self, name, nr_ped):
+        """Registros do pedido na aba, no mesmo formato de db.get_records()."""
+        key = normalize_key(nr_ped)
+        return self._with_rows(name, [key], lambda index: self._to_records(index.header, [
+            index.values_by_row.get(r) or [] for r in index.rows_by_key.get(key, [])
+        ]))
+
+    def records_many(self, name, nr_peds):
+        """{NR_PED: registros} de vários pedidos, relendo as linhas desatualizadas num único batchGet."""
+        keys = list(dict.fromkeys(normalize_key(nr) for nr in nr_peds))
+        return self._with_rows(name, keys, lambda index: {
+            key: self._to_records(index.header, [
+                index.values_by_row.get(r) or [] for r in index.rows_by_key.get(key, [])
+            ])
+            for key in keys
+        })
+
+    def _with_rows(self, name, keys, read):
+        """
+        read(índice) sob o lock, com as linhas dos pedidos já em memória. As linhas
+        desatualizadas são relidas num único batchGet, fora do lock.
+        """
+        while True:
+            index = self._ensure(name)
+            with self._lock:
+                if index.stale:
+                    continue
+                missing = [
+                    r for key in keys for r in index.rows_by_key.get(key, [])
+                    if index.values_by_row.get(r) is None
+                ]
+                if not missing:
+                    return read(index)
+                mudancas = self._changes[name]
+                width = max(len(index.header), index.key_col)
+
+            lidas = self._read_rows(name, missing, width)
+
+            with self._lock:
+                # Escrita ou remontagem durante a leitura: as linhas podem ter mudado de lugar
+                if self._changes[name] != mudancas or index.stale:
+                    continue
+                if self._apply_rows(index, lidas):
+                    return read(index)
+            db.invalidate(name)
+            self.invalidate(name)
+
+    @staticmethod
+    def _to_records(header, rows):
+        width = len(header)
+        return db.to_records([header] + [list(r) + [""] * (width - len(r)) for r in rows])
+
+    def first_record(self, name, nr_ped):
+        records = self.records(name, nr_ped)
+        return records[0] if records else None
+
+    # --- leitura pontual no Sheets ---
+    def _batch_get(self, name, ranges):
+        ws = db.sheets[name]
+        response = ws.spreadsheet.values_batch_get([absolute_range_name(ws.title, r) for r in ranges])
+        return [vr.get("values", []) for vr in response.get("valueRanges", [])]
+
+    def _mismatched(self, key, rows_by_name):
+        """Abas cujas linhas não pertencem mais ao pedido (uma leitura por planilha)."""
+        por_planilha = {}
+        for name, rows in rows_by_name.items():
+            if not rows:
+                continue
+            index = self._indexes[name]
+            col = index.key_col
+            for a, b in _row_groups(rows):
+                ws = db.sheets[name]
+                faixa = absolute_range_name(ws.title, f"{rowcol_to_a1(a, col)}:{rowcol_to_a1(b, col)}")
+                por_planilha.setdefault(ws.spreadsheet_id, (ws.spreadsheet, []))[1].append((name, a, b, faixa))
+
+        ruins = set()
+        for spreadsheet, faixas in por_planilha.values():
+            response = spreadsheet.values_batch_get([f for _, _, _, f in faixas])
+            for (name, a, b, _), vr in zip(faixas, response.get("valueRanges", [])):
+                values = vr.get("values", [])
+                values = values + [[]] * (b - a + 1 - len(values))
+                if any(normalize_key(v[0] if v else "") != key for v in values):
+                    ruins.add(name)
+        return ruins
+
+    def _read_rows(self, name, rows, width):
+        """Relê as linhas informadas no Sheets (um batchGet): [(número_da_linha, valores)]."""
+        groups = _row_groups(rows)
+        ranges = [f"{rowcol_to_a1(a, 1)}:{rowcol_to_a1(b, width)}" for a, b in groups]
+        lidas = []
+        for (a, b), values in zip(groups, self._batch_get(name, ranges)):
+            for offset in range(b - a + 1):
+                row = values[offset] if offset < len(values) else []
+                lidas.append((a + offset, list(row) + [""] * (width - len(row))))
+        return lidas
+
+    def _apply_rows(self, index, lidas):
+        """Guarda as linhas relidas, conferindo a chave de cada uma. False se a planilha mudou por fora."""
+        if any(normalize_key(row[index.key_col - 1]) != index.key_by_row.get(r) for r, row in lidas):
+            return False
+        for r, row in lidas:
+            index.values_by_row[r] = row
+        return True
+
+    # --- deltas vindos das escritas do app ---
+    def _on_write(self, name, event, data):
+        if name not in self._indexes:
+            return
+        with self._lock:
+            index = self._indexes[name]
+            if index.stale:
+                # Será remontado no próximo acesso; sem ele não dá para saber os pedidos afetados
+                keys = None
+            elif event == "append":
+                keys = index.on_append(data["start_row"], data["rows"])
+                if index.stale:
+                    keys = None
+            elif event == "update":
+                keys = index.on_update(data["row_numbers"])
+            elif event == "delete":
+                keys = index.on_delete(data["start"], data["end"])
+            else:
+                return
+            self._changes[name] += 1
+            # Abas de detalhe alimentam colunas calculadas de PEDIDOS (status, valor)
+            for parent in DEPENDENT_SHEETS.get(name, ()):
+                if parent in self._indexes:
+                    self._changes[parent] += 1
+                    if keys is None:
+                        self._indexes[parent].stale = True
+                    else:
+                        for key in keys:
+                            self._indexes[parent].mark_dirty(key)
+            if keys:
+                self._notify(name, keys)
+
+
+order_index = OrderIndex()
+
+
+class OrderView(abc.ABC):
+    """
+    Base para estruturas derivadas de PEDIDOS mantidas por deltas (resumo do
+    dashboard, diretório de clientes...). Recebe do índice os NR_PED alterados
+    e, em sync(), relê só esses registros (um batchGet) e chama
+    _substituir(nr, registros). Quando o índice é remontado, refaz tudo.
+
+    Subclasses implementam _reset() e _substituir(nr, registros).
+    """
+
+    # Mudanças em ITENS/CUSTOS/STATUS também afetam a view (colunas calculadas de PEDIDOS)?
+    watch_dependents = True
+
+    def __init__(self):
+        self._lock = threading.Lock()        # protege os dados da view e o conjunto de sujos
+        self._sync_lock = threading.Lock()   # uma sincronização por vez
+        self._dirty = set()
+        self._rebuild_pending = True
+        self._reset()
+        order_index.add_listener(self._on_change)
+
+    @abc.abstractmethod
+    def _reset(self):
+        """Esvazia a view (chamado na criação e antes de remontar tudo)."""
+
+    @abc.abstractmethod
+    def _substituir(self, key, registros):
+        """Troca a contribuição do pedido 'key' pelos registros atuais ([] se ele sumiu)."""
+
+    # --- avisos do índice ---
+    def _on_change(self, name, keys):
+        dependente = 'pedidos' in DEPENDENT_SHEETS.get(name, ())
+        if name != 'pedidos' and not (dependente and self.watch_dependents):
+            return
+        with self._lock:
+            if keys is None:
+                if name == 'pedidos':
+                    self._rebuild_pending = True
+            else:
+                self._dirty.update(keys)
+
+    # --- sincronização ---
+    def sync(self):
+        with self._sync_lock:
+            # Absorve edições externas: se o índice remontou PEDIDOS, o aviso chega aqui
+            order_index.refresh('pedidos')
+            while True:
+                with self._lock:
+                    rebuild = self._rebuild_pending
+                    keys = self._dirty
+                    self._rebuild_pending = False
+                    self._dirty = set()
+                if not rebuild and not keys:
+                    break
+                if rebuild:
+                    keys = order_index.keys('pedidos')
+                # Linhas alteradas são relidas num único batchGet pelo índice
+                registros = order_index.records_many('pedidos', keys)
+                with self._lock:
+                    if rebuild:
+                        self._reset()
+                    for key, regs in registros.items():
+                        self._substituir(key, regs)
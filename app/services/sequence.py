@@ -0,0 +1,113 @@
+# app/services/sequence.py
+"""
+Gerador de NR_PED: entrega o próximo número em O(1), sem baixar PEDIDOS e sem
+repetir número entre threads.
+
+- O contador fica em memória, protegido por lock, e é semeado uma única vez
+  com o maior NR_PED do índice (e do contador persistido, se houver).
+- Com NR_PED_COUNTER_RANGE configurado (ex: "CONTADOR!A1", na planilha de
+  PEDIDOS), o app reserva blocos de NR_PED_BLOCK números gravando o fim do
+  bloco nessa célula: uma escrita a cada bloco, e após um restart a contagem
+  continua depois do último bloco reservado (números não usados viram lacuna,
+  nunca duplicata).
+- Números que já aparecem no índice (ex: criados pelo bot) são pulados: os
+  números entregues por reserve(count) nunca incluem um já usado.
+
+O lock vale para o processo (gunicorn roda com 1 worker e várias threads).
+"""
+import os
+import threading
+from app.db import db
+from app.services.order_index import order_index
+
+DEFAULT_BLOCK = 10
+
+
+def _to_int(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return 0
+
+
+class SequenceAllocator:
+    def __init__(self, name='pedidos', counter_range=None, block=DEFAULT_BLOCK):
+        self.name = name
+        self.counter_range = counter_range
+        self.block = max(int(block), 1)
+        self._lock = threading.Lock()
+        self._next = None          # próximo número a entregar
+        self._reserved_until = 0   # último número coberto pela reserva persistida
+
+    @classmethod
+    def from_env(cls, name='pedidos'):
+        return cls(
+            name=name,
+            counter_range=os.environ.get("NR_PED_COUNTER_RANGE") or None,
+            block=_to_int(os.environ.get("NR_PED_BLOCK")) or DEFAULT_BLOCK,
+        )
+
+    # --- contador persistido ---
+    def _spreadsheet(self):
+        return db.sheets[self.name].spreadsheet
+
+    def _read_counter(self):
+        response = self._spreadsheet().values_batch_get([self.counter_range])
+        values = response.get("valueRanges", [{}])[0].get("values", [])
+        return _to_int(values[0][0]) if values and values[0] else 0
+
+    def _write_counter(self, value):
+        self._spreadsheet().values_update(
+            self.counter_range, params={"valueInputOption": "RAW"}, body={"values": [[value]]}
+        )
+
+    # --- alocação ---
+    def _max_in_sheet(self):
+        numeros = [int(k) for k in order_index.keys(self.name) if k.isdigit()]
+        return max(numeros) if numeros else 0
+
+    def _seed(self):
+        ultimo = self._max_in_sheet()
+        if self.counter_range:
+            self._reserved_until = self._read_counter()
+            ultimo = max(ultimo, self._reserved_until)
+        self._next = ultimo + 1
+        print(f"🔢 [SEQ] NR_PED semeado: próximo = {self._next}")
+
+    def _ensure_reserved(self, last):
+        """Garante que a reserva persistida cobre até 'last' (grava um bloco novo se preciso)."""
+        if not self.counter_range or last <= self._reserved_until:
+            return
+        fim = last + self.block - 1
+        self._write_counter(fim)
+        self._reserved_until = fim
+
+    def reserve(self, count=1):
+        """Reserva 'count' números consecutivos e devolve range(primeiro, último + 1)."""
+        count = max(int(count), 1)
+        with self._lock:
+            if self._next is None:
+                self._seed()
+            # Pula números já usados fora do app (ex: pedido criado pelo bot): todo o
+            # intervalo precisa estar livre; uma colisão recomeça logo depois dela
+            primeiro = numero = self._next
+            while numero < primeiro + count:
+                if order_index.rows(self.name, numero):
+                    primeiro = numero + 1
+                numero += 1
+            self._ensure_reserved(primeiro + count - 1)
+            self._next = primeiro + count
+            return range(primeiro, primeiro + count)
+
+    def next(self):
+        """Próximo NR_PED livre."""
+        return self.reserve(1)[0]
+
+    def reset(self):
+        """Descarta o contador em memória; será semeado de novo no próximo uso."""
+        with self._lock:
+            self._next = None
+            self._reserved_until = 0
+
+
+nr_ped_sequence = SequenceAllocator.from_env()
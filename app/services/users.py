@@ -0,0 +1,102 @@
+# app/services/users.py
+"""
+Diretório de usuários (aba ADM_BOT) em memória: login e layout dos cards.
+
+Os usuários ficam indexados por telefone normalizado (só dígitos) e por nome,
+com a linha de cada um na planilha (colunas localizadas pelo cabeçalho):
+
+- login é uma busca em dicionário, sem baixar a aba a cada tentativa;
+- o dashboard lê o layout daqui, sem ler ADM_BOT;
+- salvar o layout grava direto na linha conhecida e atualiza a memória.
+
+O diretório é remontado quando o cache da aba traz outra versão dos dados
+(edição no Sheets ou pelo bot, recarregada pelo SheetWatcher). Se a aba saiu do
+cache, a memória vale até o TTL da aba; depois disso ADM_BOT é lida de novo.
+"""
+import hmac
+import threading
+import time
+from app.db import db
+from app.models import Usuario, chave_fone, chave_nome
+
+class UserDirectory:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = None          # lista do cache de onde o diretório foi montado
+        self._carregado_em = None
+        self._por_fone = {}          # telefone -> [usuários] (na ordem da planilha)
+        self._por_nome = {}          # nome normalizado -> primeiro usuário com o nome
+        self.version = 0             # muda quando algum layout muda
+
+    def _recente(self):
+        return self._carregado_em is not None and time.monotonic() - self._carregado_em < db.cache_ttl.get('usuarios', 0)
+
+    def _atualizar(self):
+        """Remonta se o cache trouxe dados novos; só lê ADM_BOT na primeira vez ou após o TTL."""
+        with self._lock:
+            values = db.cached_values('usuarios')
+            if values is None:
+                if self._recente():
+                    return
+                values = db.snapshot_values(['usuarios'])['usuarios']
+            if values is self._values:
+                return
+
+            por_fone, por_nome = {}, {}
+            for u in Usuario.from_values(values):
+                if u.fone:
+                    por_fone.setdefault(u.fone, []).append(u)
+                por_nome.setdefault(u.nome, u)
+            layouts = {nome: u.layout for nome, u in por_nome.items()}
+            if layouts != {nome: u.layout for nome, u in self._por_nome.items()}:
+                self.version += 1
+            self._por_fone, self._por_nome = por_fone, por_nome
+            self._values = values
+            self._carregado_em = time.monotonic()
+
+    def data_version(self):
+        """Versão dos layouts, sem acessar a rede; None se o próximo acesso recarregaria a aba."""
+        with self._lock:
+            values = db.cached_values('usuarios')
+            if values is None:
+                return self.version if self._recente() else None
+            return self.version if values is self._values else None
+
+    def autenticar(self, fone, senha):
+        """Usuário com esse telefone e senha, ou None."""
+        self._atualizar()
+        senha = str(senha if senha is not None else "").strip().encode("utf-8")
+        with self._lock:
+            candidatos = list(self._por_fone.get(chave_fone(fone), ()))
+        for u in candidatos:
+            if hmac.compare_digest(str(u.SENHA).strip().encode("utf-8"), senha):
+                return u
+        return None
+
+    def layout(self, nome):
+        """Ordem salva dos cards do usuário ([] se não houver)."""
+        self._atualizar()
+        with self._lock:
+            u = self._por_nome.get(chave_nome(nome))
+            return list(u.layout) if u else []
+
+    def salvar_layout(self, nome, ordem):
+        """Grava LAYOUT_CARDS na linha do usuário. False se o usuário não está na aba."""
+        self._atualizar()
+        with self._lock:
+            u = self._por_nome.get(chave_nome(nome))
+        if u is None:
+            return False
+        texto = ",".join(ordem)
+        # Coluna pelo nome no cabeçalho: a posição de LAYOUT_CARDS na aba pode mudar
+        coluna = db.resolve_columns('usuarios', ['LAYOUT_CARDS'])[0]
+        db.sheets['usuarios'].update_cell(u.row_index, coluna, texto)
+        db.after_update('usuarios', [u.row_index])
+        with self._lock:
+            u.LAYOUT_CARDS = texto
+            u.layout = list(ordem)
+            self.version += 1
+        return True
+
+
+user_directory = UserDirectory()
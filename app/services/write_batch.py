@@ -0,0 +1,151 @@
+# app/services/write_batch.py
+"""
+Escritas agrupadas: junta as linhas novas, as alterações de células e as
+exclusões de uma operação lógica (ex: novo pedido = PEDIDOS + ITENS + CUSTOS +
+STATUS; excluir pedido = linhas das quatro abas) e envia tudo em poucas
+chamadas por planilha, em vez de uma chamada por faixa de linhas:
+
+1. values:append com valueInputOption=USER_ENTERED, uma chamada por aba com
+   linhas novas: o Sheets escolhe a posição e grava na mesma operação, então
+   um append_row concorrente (bot, status, pagamentos) nunca é sobrescrito;
+2. values:batchUpdate com valueInputOption=USER_ENTERED: todas as células
+   alteradas, de todas as abas, numa chamada;
+3. spreadsheets.batchUpdate com os deleteDimension, de baixo para cima.
+
+Os valores são interpretados pelo próprio Sheets como se fossem digitados
+(moeda e números pt_BR, porcentagem, datas, fórmulas). As exclusões vão por
+último: se uma gravação falhar, nada foi apagado. A resposta de cada append
+traz a linha inicial gravada, e o índice NR_PED é atualizado por delta, sem
+reler a planilha.
+"""
+import threading
+from gspread.utils import absolute_range_name, rowcol_to_a1
+from app.db import db, appended_start_row
+
+# Um lote por vez por planilha: os avisos ao índice NR_PED seguem a ordem das escritas
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_planilha(spreadsheet_id):
+    with _locks_guard:
+        return _locks.setdefault(spreadsheet_id, threading.Lock())
+
+
+def _faixas_decrescentes(row_numbers):
+    """{2, 3, 4, 8} -> [(8, 8), (2, 4)]: faixas consecutivas, da mais baixa na planilha para a mais alta."""
+    faixas = []
+    for row in sorted(row_numbers):
+        if faixas and row == faixas[-1][1] + 1:
+            faixas[-1] = (faixas[-1][0], row)
+        else:
+            faixas.append((row, row))
+    return faixas[::-1]
+
+
+class WriteBatch:
+    """
+    Uso:
+        batch = WriteBatch()
+        batch.append('pedidos', [linha])
+        batch.append('itens', linhas_itens)
+        batch.update_cells('itens', 15, 3, ['2'])
+        batch.delete_rows('custos', [7, 8, 12])
+        resultado = batch.commit()   # {'pedidos': {'rows': 1, 'start_row': 42, 'updated': 0, 'deleted': 0}, ...}
+
+    Os números de linha informados valem todos para a planilha antes do lote:
+    as linhas novas entram depois da última com dados, e as exclusões vão por
+    último, de baixo para cima, sem que uma faixa desloque outra.
+    """
+
+    def __init__(self):
+        self._updates = {}
+        self._appends = {}
+        self._deletes = {}
+
+    def update_cells(self, name, row_number, col, values):
+        """Grava 'values' na linha row_number a partir da coluna col (1 = A)."""
+        if values:
+            self._updates.setdefault(name, []).append((int(row_number), int(col), list(values)))
+        return self
+
+    def append(self, name, rows):
+        if rows:
+            self._appends.setdefault(name, []).extend(list(r) for r in rows)
+        return self
+
+    def delete_rows(self, name, row_numbers):
+        """Marca linhas (nº do Excel, não precisam ser consecutivas) para exclusão."""
+        if row_numbers:
+            self._deletes.setdefault(name, set()).update(int(r) for r in row_numbers)
+        return self
+
+    def commit(self):
+        """Envia as escritas de cada planilha (ver docstring do módulo) e devolve {aba: {'rows', 'start_row', 'updated', 'deleted'}}."""
+        por_planilha = {}
+        for name in dict.fromkeys([*self._updates, *self._appends, *self._deletes]):
+            por_planilha.setdefault(db.sheets[name].spreadsheet_id, []).append(name)
+
+        resultados = {}
+        for spreadsheet_id, abas in por_planilha.items():
+            with _lock_planilha(spreadsheet_id):
+                resultados.update(self._commit_planilha(abas))
+        self._updates = {}
+        self._appends = {}
+        self._deletes = {}
+        return resultados
+
+    def _commit_planilha(self, abas):
+        spreadsheet = db.sheets[abas[0]].spreadsheet
+        resultados = {}
+        for name in abas:
+            rows = self._appends.get(name, [])
+            start_row = None
+            if rows:
+                response = db.sheets[name].append_rows(rows, value_input_option="USER_ENTERED")
+                start_row = appended_start_row(response)
+                db.after_append(name, rows, response)
+            resultados[name] = {"rows": len(rows), "start_row": start_row, "updated": 0, "deleted": 0}
+
+        dados = [
+            _faixa_valores(db.sheets[name].title, row_number, col, [values])
+            for name in abas for row_number, col, values in self._updates.get(name, [])
+        ]
+        if dados:
+            spreadsheet.values_batch_update({"valueInputOption": "USER_ENTERED", "data": dados})
+            for name in abas:
+                updates = self._updates.get(name, [])
+                if updates:
+                    db.after_update(name, sorted({row_number for row_number, _, _ in updates}))
+                    resultados[name]["updated"] = sum(len(values) for _, _, values in updates)
+
+        faixas = {name: _faixas_decrescentes(self._deletes[name]) for name in abas if self._deletes.get(name)}
+        if faixas:
+            spreadsheet.batch_update({"requests": [
+                req for name, faixas_aba in faixas.items()
+                for req in self._requests_delete(db.sheets[name].id, faixas_aba)
+            ]})
+            for name, faixas_aba in faixas.items():
+                for a, b in faixas_aba:
+                    db.after_delete(name, a, b)
+                resultados[name]["deleted"] = sum(b - a + 1 for a, b in faixas_aba)
+        return resultados
+
+    @staticmethod
+    def _requests_delete(sheet_id, faixas):
+        return [{
+            "deleteDimension": {
+                "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": a - 1, "endIndex": b}
+            }
+        } for a, b in faixas]
+
+
+def _faixa_valores(title, row_number, col, rows):
+    """Item de values:batchUpdate: bloco 'rows' a partir da célula (row_number, col), 1-based."""
+    largura = max((len(r) for r in rows), default=1) or 1
+    inicio = rowcol_to_a1(row_number, col)
+    fim = rowcol_to_a1(row_number + len(rows) - 1, col + largura - 1)
+    return {
+        "range": absolute_range_name(title, f"{inicio}:{fim}"),
+        "values": [["" if v is None else v for v in row] for row in rows],
+    }
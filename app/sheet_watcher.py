@@ -0,0 +1,102 @@
+# app/sheet_watcher.py
+"""
+Detecção de mudanças feitas fora do app (direto no Google Sheets ou pelo bot do
+WhatsApp, que grava em ADM_BOT e nas abas de pedidos).
+
+Uma thread consulta, a cada poucos segundos, só o modifiedTime de cada planilha
+no Drive (uma chamada barata, fora da cota do Sheets):
+
+- Não mudou: o cache continua atual e tem o TTL renovado. Em períodos sem
+  edições nada é baixado de novo, por mais que o TTL seja curto.
+- Mudou: o cache das abas da planilha é descartado e as abas já usadas pelo app
+  são baixadas de novo num único batchGet. Só as abas cujo conteúdo mudou viram
+  "dado novo" (geração do cache), o que remonta o índice NR_PED e troca os ETags.
+
+Escritas do próprio app também mudam o modifiedTime; elas já invalidam o cache
+na hora, então o watcher só custa um batchGet a mais nesses casos.
+
+Configuração por variável de ambiente:
+  SHEETS_WATCH_INTERVAL  segundos entre verificações (padrão 5; 0 desliga)
+"""
+import os
+import threading
+import time
+
+DEFAULT_INTERVAL = 5.0
+
+
+class SheetWatcher:
+    def __init__(self, db, interval=DEFAULT_INTERVAL):
+        self.db = db
+        self.interval = interval
+        # modifiedTime visto por último em cada planilha
+        self._modificado = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"checks": 0, "changes": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls, db):
+        raw = os.environ.get("SHEETS_WATCH_INTERVAL")
+        interval = DEFAULT_INTERVAL
+        if raw not in (None, ""):
+            try:
+                interval = max(float(raw), 0.0)
+            except ValueError:
+                print(f"⚠️ [WATCH] SHEETS_WATCH_INTERVAL inválido: {raw!r}. Usando {DEFAULT_INTERVAL}.")
+        return cls(db, interval)
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def start(self):
+        if not self.interval or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sheets-watcher", daemon=True)
+        self._thread.start()
+        print(f"👀 [WATCH] Verificando alterações nas planilhas a cada {self.interval:g}s")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for alias in self.db.spreadsheet_ids:
+                try:
+                    self.check(alias)
+                except Exception as e:
+                    # Sem verificação o cache volta a depender só do TTL
+                    self._count("errors")
+                    print(f"⚠️ [WATCH] Falha ao verificar {alias}: {e}")
+
+    def check(self, alias):
+        """Consulta o modifiedTime da planilha; devolve True se ela mudou desde a última verificação."""
+        modificado = self.db.spreadsheet(alias).get_lastUpdateTime()
+        self._count("checks")
+        anterior = self._modificado.get(alias)
+        abas = self.db.tabs(alias)
+        if modificado == anterior:
+            self.db.renew(abas)
+            return False
+
+        # Primeira verificação não tem referência: o que já está no cache pode ser anterior
+        self._modificado[alias] = modificado
+        self.db.expire(abas)
+        if anterior is None:
+            return False
+
+        self._count("changes")
+        usadas = [name for name in abas if self.db.generation(name)]
+        if usadas:
+            t0 = time.perf_counter()
+            self.db.refresh(usadas)
+            print(f"🔄 [WATCH] {alias} alterada: {len(usadas)} abas recarregadas "
+                  f"em {(time.perf_counter() - t0) * 1000:.0f} ms")
+        return True
@@ -4,7 +4,6 @@ import unicodedata
 import re
 from babel.numbers import format_currency
 from babel.dates import format_date
-from gspread.utils import rowcol_to_a1
 
 # ==========================
 # FORMATADORES E PARSERS
@@ -30,7 +29,7 @@ def parse_date(value):
     if isinstance(value, date):
         return value
     s = str(value).strip()
-    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y"):
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y", "%d-%m-%Y", "%d.%m.%Y"):
         try:
             return datetime.strptime(s, fmt).date()
         except Exception:
@@ -96,76 +95,3 @@ def safe_json_list(raw_value, label, logger=None):
 def is_paid(v):
     s = str(v or "").strip().lower()
     return s in {"sim", "s", "yes", "y", "true", "1", "pago"}
-
-# ==========================
-# UTILITÁRIOS DE LISTAS E SHEETS
-# ==========================
-
-def agrupar_consecutivas(seq):
-    """Agrupa números consecutivos, ex: [1, 2, 3, 5, 6] -> [[1, 3], [5, 6]] (ranges inclusivos)"""
-    seq = sorted(list(set(seq))) # Garante ordenação e unicidade
-    if not seq:
-        return []
-    grupos, grupo = [], [seq[0]]
-    for i in seq[1:]:
-        if i == grupo[-1] + 1:
-            grupo.append(i)
-        else:
-            grupos.append(grupo)
-            grupo = [i]
-    grupos.append(grupo)
-    return grupos
-
-def get_row_indices_by_col(values, col_index, target_value):
-    indices = []
-    # Assumindo values[0] como header, dados começam em values[1] -> linha 2 do excel
-    for i, row in enumerate(values[1:], start=2):
-        val = row[col_index - 1] if col_index - 1 < len(row) else ""
-        if str(val).strip() == str(target_value):
-            indices.append(i)
-    return indices
-
-def append_rows_safe(ws, rows):
-    if rows:
-        ws.append_rows(rows, value_input_option="USER_ENTERED")
-
-def batch_update_rows(ws, row_indices, rows):
-    if not row_indices or not rows:
-        return
-    col_count = max(len(r) for r in rows)
-    data = []
-    for row_index, row_vals in zip(row_indices, rows):
-        padded = row_vals + [""] * (col_count - len(row_vals))
-        start = rowcol_to_a1(row_index, 1)
-        end = rowcol_to_a1(row_index, col_count)
-        data.append({"range": f"{start}:{end}", "values": [padded]})
-    ws.batch_update(data, value_input_option="USER_ENTERED")
-
-def replace_detail_rows(ws, col_index, key_value, new_rows):
-    """
-    Substitui linhas detalhe (itens/custos).
-    Estratégia:
-    1. Se quantidades batem: atualiza in-place (mais rápido).
-    2. Se não batem: Adiciona novos no final e deleta os antigos.
-    """
-    values = ws.get_all_values()
-    row_indices = get_row_indices_by_col(values, col_index, key_value)
-
-    # Caso 1: Apenas deletar (se new_rows vazio)
-    if not new_rows:
-        # IMPORTANTE: Deletar de baixo para cima (reversed) para não mudar os índices das linhas de cima
-        for grupo in reversed(agrupar_consecutivas(row_indices)):
-            ws.delete_rows(grupo[0], grupo[-1])
-        return
-
-    # Caso 2: Atualização exata (mesma quantidade de linhas)
-    if len(row_indices) == len(new_rows):
-        batch_update_rows(ws, row_indices, new_rows)
-        return
-
-    # Caso 3: Quantidade diferente (Append + Delete)
-    append_rows_safe(ws, new_rows)
-    
-    # Deleta os antigos (sempre usando reversed para segurança)
-    for grupo in reversed(agrupar_consecutivas(row_indices)):
-        ws.delete_rows(grupo[0], grupo[-1])
\ No newline at end of file
@@ -0,0 +1,50 @@
+# tests/conftest.py
+"""
+Os testes rodam contra o backend local (SHEETS_BACKEND=fake), semeado com os
+CSVs de fixtures/sheets. Cada teste que usa 'planilhas' começa com as planilhas
+recarregadas dos CSVs e os caches / índices zerados.
+"""
+import os
+
+os.environ.setdefault("SHEETS_BACKEND", "fake")
+os.environ.setdefault("SHEETS_WARMUP", "off")
+os.environ.setdefault("SHEETS_WATCH_INTERVAL", "0")
+
+import pytest
+from app import create_app
+from app.db import db, WORKSHEETS
+from app.fake_sheets import FakeClient
+from app.services.order_index import order_index
+from app.services.sequence import nr_ped_sequence
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.testing = True
+    return app
+
+
+@pytest.fixture
+def planilhas(app):
+    """db com as planilhas fake no estado dos CSVs."""
+    db.client = FakeClient.from_env()
+    db.spreadsheets.clear()
+    db.sheets._loaded.clear()
+    db.invalidate(*WORKSHEETS)
+    order_index.invalidate()
+    nr_ped_sequence.reset()
+    return db
+
+
+@pytest.fixture
+def client(app, planilhas):
+    """Cliente de teste já logado."""
+    client = app.test_client()
+    client.post("/login", data={"fone": "65999990000", "senha": "1234"})
+    return client
+
+
+def linhas(name):
+    """Valores atuais da aba direto do backend fake (sem cache)."""
+    return db.sheets[name].get_all_values()
@@ -0,0 +1,20 @@
+from conftest import linhas
+
+
+def projecao_esperada(name, columns):
+    values = linhas(name)
+    cols = [values[0].index(c) for c in columns]
+    return [[row[c] for c in cols] for row in values]
+
+
+def test_projecao_segue_coluna_movida_na_planilha(planilhas):
+    colunas = ['CLIENTE', 'VLR_RECEB']
+    assert planilhas.get_columns('pagamentos', colunas) == projecao_esperada('pagamentos', colunas)
+
+    # Alguém troca DT_RECEB e VLR_RECEB de lugar direto no Sheets
+    values = linhas('pagamentos')
+    planilhas.sheets['pagamentos'].update(values=[[r[0], r[2], r[1]] + r[3:] for r in values], range_name="A1")
+    planilhas.expire(['pagamentos'])
+
+    assert planilhas.get_columns('pagamentos', colunas) == projecao_esperada('pagamentos', colunas)
+    assert planilhas.resolve_columns('pagamentos', ['VLR_RECEB']) == (2,)
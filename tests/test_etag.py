@@ -0,0 +1,79 @@
+import pytest
+from app.fake_sheets import FakeSpreadsheet, FakeWorksheet
+from app.services.write_batch import WriteBatch
+
+
+@pytest.fixture
+def leituras(monkeypatch):
+    """Registra as leituras feitas ao backend: [método]."""
+    registro = []
+    for classe, metodo in ((FakeSpreadsheet, "values_batch_get"), (FakeWorksheet, "get_all_values")):
+        original = getattr(classe, metodo)
+
+        def espiao(self, *args, _metodo=metodo, _original=original, **kwargs):
+            registro.append(_metodo)
+            return _original(self, *args, **kwargs)
+
+        monkeypatch.setattr(classe, metodo, espiao)
+    return registro
+
+
+@pytest.mark.parametrize("url", [
+    "/", "/detalhes/porcliente/todos", "/areceber", "/financeiro/", "/financeiro/?cliente=ANA SOUZA", "/status/3",
+])
+def test_mesmo_etag_responde_304_sem_ler_a_planilha(client, leituras, url):
+    primeira = client.get(url)
+    assert primeira.status_code == 200
+    etag = primeira.headers["ETag"]
+
+    del leituras[:]
+    resposta = client.get(url, headers={"If-None-Match": etag})
+    assert resposta.status_code == 304
+    assert resposta.get_data() == b""
+    assert resposta.headers["ETag"] == etag
+    assert leituras == []
+
+
+def test_escrita_troca_o_etag(client):
+    url = "/detalhes/porcliente/todos"
+    etag = client.get(url).headers["ETag"]
+    WriteBatch().update_cells('pedidos', 2, 13, ["observação nova"]).commit()
+
+    resposta = client.get(url, headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert resposta.headers["ETag"] != etag
+
+
+def test_etag_depende_da_url(client):
+    etag = client.get("/financeiro/").headers["ETag"]
+    resposta = client.get("/financeiro/?cliente=ANA SOUZA", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert resposta.headers["ETag"] != etag
+
+
+def test_pagamento_novo_troca_o_etag_do_extrato(client):
+    url = "/financeiro/?cliente=ANA SOUZA"
+    etag = client.get(url).headers["ETag"]
+    client.post("/financeiro/", data={
+        "registrar_pagamento": "1", "cliente_hidden": "ANA SOUZA", "valor": "10,00", "data": "2025-01-02", "obs": "",
+    })
+    # Com o flash do pagamento pendente, nada de ETag nem 304
+    pendente = client.get(url, headers={"If-None-Match": etag})
+    assert pendente.status_code == 200
+    assert "ETag" not in pendente.headers
+
+    # Flash exibido (consumido por outra tela): o ETag volta, diferente do anterior
+    with client.session_transaction() as sessao:
+        sessao.pop("_flashes", None)
+    resposta = client.get(url, headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert resposta.headers["ETag"] != etag
+
+
+def test_layout_salvo_troca_o_etag_do_dashboard(client):
+    etag = client.get("/").headers["ETag"]
+    assert client.post("/salvar_layout", json={"ordem": ["card-prazo", "card-receber"]}).get_json()["ok"]
+
+    resposta = client.get("/", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert resposta.headers["ETag"] != etag
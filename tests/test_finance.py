@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from gspread.utils import a1_to_rowcol
+from app.services import finance
+
+
+def baixa_antiga(pedidos, total_pago):
+    """O laço FIFO de antes do livro-razão: ({linha: PAGO}, saldo restante)."""
+    saldo = total_pago
+    estado = {}
+    for pedido in pedidos:
+        if saldo >= pedido['valor'] - 0.01:
+            estado[pedido['row_index']] = "SIM"
+            saldo -= pedido['valor']
+        else:
+            estado[pedido['row_index']] = ""
+            saldo = 0
+    return estado, saldo
+
+
+def ledger_aleatorio(rnd, com_estorno):
+    # Valores múltiplos de 0,25: as somas são exatas e nenhuma cai a menos de 1 centavo da fronteira
+    valores = [0, 0.5, 1, 10, 25.5, 100, 120.25] + ([-10, -0.5] if com_estorno else [])
+    n = rnd.randint(0, 10)
+    pedidos = [{
+        'row_index': i + 2,
+        'id_num': i + 1,
+        'dt_entreg': '',
+        'valor': rnd.choice(valores),
+        'status_pago_atual': rnd.choice(["SIM", ""]),
+    } for i in range(n)]
+    prefixo = sum(p['valor'] for p in pedidos[:rnd.randint(0, n)])
+    total = prefixo + rnd.choice([0, 0.25, -0.25, 5, -200])
+    return pedidos, total
+
+
+def baixa_nova(pedidos, total_pago, forcar=True):
+    copias = [dict(p) for p in pedidos]
+    resultado, updates, _ = finance._baixa_cliente("CLIENTE TESTE", total_pago, [], copias, forcar)
+    estado = {p['row_index']: p['status_pago_atual'] for p in pedidos}
+    for u in updates or []:
+        estado[a1_to_rowcol(u['range'])[0]] = u['values'][0][0]
+    return estado, resultado, updates
+
+
+@pytest.mark.parametrize("com_estorno", [False, True])
+def test_livro_razao_igual_ao_laco_antigo(planilhas, com_estorno):
+    rnd = random.Random(14 + com_estorno)
+    for _ in range(2000):
+        pedidos, total = ledger_aleatorio(rnd, com_estorno)
+        esperado, saldo = baixa_antiga(pedidos, total)
+        estado, resultado, _ = baixa_nova(pedidos, total)
+        assert estado == esperado, (pedidos, total)
+        assert resultado['saldo_restante'] == pytest.approx(saldo), (pedidos, total)
+
+
+def test_grava_so_as_celulas_que_mudam(planilhas):
+    rnd = random.Random(3)
+    for _ in range(500):
+        pedidos, total = ledger_aleatorio(rnd, True)
+        esperado, _ = baixa_antiga(pedidos, total)
+        _, _, updates = baixa_nova(pedidos, total)
+        mudam = {p['row_index'] for p in pedidos if p['status_pago_atual'] != esperado[p['row_index']]}
+        assert sorted(a1_to_rowcol(u['range'])[0] for u in updates) == sorted(mudam)
+
+
+def test_cliente_sem_alteracao_informa_o_mesmo_saldo(planilhas, monkeypatch):
+    monkeypatch.setattr(finance, "_assinaturas", {})
+    rnd = random.Random(5)
+    for _ in range(300):
+        pedidos, total = ledger_aleatorio(rnd, True)
+        _, saldo = baixa_antiga(pedidos, total)
+        copias = [dict(p) for p in pedidos]
+        _, _, assinatura = finance._baixa_cliente("CLIENTE TESTE", total, [], copias, True)
+        finance._assinaturas["CLIENTE TESTE"] = assinatura
+
+        resultado, updates, _ = finance._baixa_cliente("CLIENTE TESTE", total, [], copias, False)
+        assert updates is None
+        assert resultado['saldo_restante'] == pytest.approx(saldo)
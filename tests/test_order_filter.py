@@ -0,0 +1,85 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+from app.models import Pedido
+from app.services.order_filter import colunas_pedidos
+from app.utils import norm_status
+
+STATUS = ["Entregue", "ENTREGUE", "entregue ", "Em Produção", "em produção", "Pendente", "Cancelado", ""]
+HOJE = date(2025, 3, 10)
+
+
+def filtro_antigo(pedidos, tipo, filtro, hoje):
+    """A cadeia de ifs de /detalhes antes dos bitmaps."""
+    pedidos_filtrados = []
+    for p in pedidos:
+        status = p.status
+        prazo = p.prazo
+        include = False
+        if tipo == "prazo":
+            if filtro == "atrasados" and prazo and prazo < hoje and status != "entregue": include = True
+            elif filtro == "hoje" and prazo and prazo == hoje and status != "entregue": include = True
+            elif filtro in {"futuro", "futuros"} and prazo and prazo > hoje and status != "entregue": include = True
+        elif tipo == "status" and status == norm_status(filtro): include = True
+        elif tipo == "receber" and status == "entregue" and not p.pago: include = True
+        elif tipo == "porcliente":
+            if filtro == "todos": include = True
+            elif filtro == "naoentregues" and status != "entregue": include = True
+        elif tipo == "porstatus" and p.status_slug == filtro.lower(): include = True
+        if include:
+            pedidos_filtrados.append(p)
+    return pedidos_filtrados
+
+
+def pedidos_aleatorios(rnd, n, dias=4):
+    prazos = ["", "data inválida"] + [(HOJE + timedelta(days=d)).strftime("%d/%m/%Y") for d in range(-dias, dias + 1)]
+    values = [list(Pedido.COLUNAS)]
+    for nr in range(1, n + 1):
+        prazo = rnd.choice(prazos)
+        values.append([
+            rnd.choice(STATUS), str(nr), "CLIENTE", "", "", prazo, "",
+            rnd.choice(["R$ 100,00", "50", ""]), rnd.choice(["Sim", "SIM", "pago", "", "não"]),
+        ])
+    return Pedido.from_values(values)
+
+
+def visoes(pedidos):
+    yield "receber", ""
+    for filtro in ("atrasados", "hoje", "futuro", "futuros", "outro"):
+        yield "prazo", filtro
+    for filtro in ("todos", "naoentregues", "outro"):
+        yield "porcliente", filtro
+    for p in pedidos:
+        yield "status", p.STATUS
+        yield "porstatus", p.status_slug
+        yield "porstatus", p.status_slug.upper()
+    yield "status", "inexistente"
+    yield "tipo-desconhecido", "todos"
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_bitmaps_iguais_a_cadeia_antiga(semente):
+    rnd = random.Random(semente)
+    pedidos = pedidos_aleatorios(rnd, rnd.randint(0, 80))
+    colunas = colunas_pedidos(pedidos)
+    for hoje in (HOJE - timedelta(days=6), HOJE, HOJE + timedelta(days=2), HOJE + timedelta(days=6)):
+        for tipo, filtro in visoes(pedidos):
+            assert colunas.select(tipo, filtro, hoje) == filtro_antigo(pedidos, tipo, filtro, hoje), (tipo, filtro, hoje)
+
+
+def test_colunas_reaproveitadas_para_a_mesma_lista():
+    pedidos = pedidos_aleatorios(random.Random(1), 10)
+    assert colunas_pedidos(pedidos) is colunas_pedidos(pedidos)
+    assert colunas_pedidos(list(pedidos)) is not colunas_pedidos(pedidos)
+
+
+def test_ordem_igual_a_cadeia_antiga_em_tamanho_real():
+    # Volume de produção: dezenas de milhares de pedidos, prazos espalhados por muitos dias
+    rnd = random.Random(50)
+    pedidos = pedidos_aleatorios(rnd, 50_000, dias=365)
+    colunas = colunas_pedidos(pedidos)
+    for tipo, filtro in [("porcliente", "todos"), ("porcliente", "naoentregues"), ("receber", ""),
+                         ("prazo", "atrasados"), ("prazo", "hoje"), ("prazo", "futuros"),
+                         ("status", "Em Produção"), ("porstatus", "entregue")]:
+        assert colunas.select(tipo, filtro, HOJE) == filtro_antigo(pedidos, tipo, filtro, HOJE), (tipo, filtro)
@@ -0,0 +1,130 @@
+import random
+import threading
+
+import pytest
+from app.fake_sheets import FakeSpreadsheet, FakeWorksheet
+from app.services.order_index import SheetIndex, order_index, normalize_key, KEY_COLUMNS
+from app.services.write_batch import WriteBatch
+from conftest import linhas
+
+
+def varredura(name):
+    """NR_PED -> linhas, varrendo a aba como o código fazia antes do índice."""
+    col = KEY_COLUMNS[name]
+    esperado = {}
+    for row_number, row in enumerate(linhas(name)[1:], start=2):
+        key = normalize_key(row[col - 1]) if len(row) >= col else ""
+        if key:
+            esperado.setdefault(key, []).append(row_number)
+    return esperado
+
+
+def indice(name):
+    return {key: order_index.rows(name, key) for key in order_index.keys(name)}
+
+
+@pytest.fixture
+def montagens(monkeypatch):
+    """Conta as remontagens completas do índice."""
+    contador = []
+    original = SheetIndex.build
+
+    def build(self, values, generation):
+        contador.append(self.name)
+        return original(self, values, generation)
+
+    monkeypatch.setattr(SheetIndex, "build", build)
+    return contador
+
+
+def test_exclusao_desloca_as_linhas_abaixo(planilhas, montagens):
+    antes = varredura('itens')
+    order_index.refresh('itens')
+    del montagens[:]
+    alvo = next(k for k, rows in antes.items() if rows[0] > 2)
+    WriteBatch().delete_rows('itens', antes[alvo]).commit()
+
+    assert indice('itens') == varredura('itens')
+    assert alvo not in order_index.keys('itens')
+    assert order_index.last_row('itens') == len(linhas('itens'))
+    assert montagens == []
+
+
+def test_append_e_exclusao_intercalados_seguem_a_planilha(planilhas, montagens):
+    rnd = random.Random(7)
+    order_index.refresh('itens')
+    del montagens[:]
+    for passo in range(30):
+        atual = varredura('itens')
+        if atual and rnd.random() < 0.5:
+            key = rnd.choice(sorted(atual))
+            rows = rnd.sample(atual[key], rnd.randint(1, len(atual[key])))
+            WriteBatch().delete_rows('itens', rows).commit()
+        else:
+            key = rnd.choice(sorted(atual) + [str(900 + passo)])
+            novas = [[key, f"Item {passo}.{i}"] for i in range(rnd.randint(1, 3))]
+            WriteBatch().append('itens', novas).commit()
+        assert indice('itens') == varredura('itens'), passo
+        assert order_index.last_row('itens') == len(linhas('itens'))
+    assert montagens == []
+
+
+def test_valores_acompanham_o_deslocamento(planilhas):
+    atual = varredura('itens')
+    primeiro, *_, ultimo = sorted(atual, key=lambda k: atual[k][0])
+    order_index.values('itens', ultimo)
+    WriteBatch().delete_rows('itens', atual[primeiro]).commit()
+
+    planilha = linhas('itens')
+    assert order_index.values('itens', ultimo) == [(r, planilha[r - 1]) for r in varredura('itens')[ultimo]]
+
+
+@pytest.fixture
+def leituras_sem_lock(monkeypatch):
+    """Em cada leitura ao backend, registra se outra thread consegue pegar o lock do índice."""
+    livre = []
+
+    def tenta_o_lock():
+        pegou = order_index._lock.acquire(blocking=False)
+        if pegou:
+            order_index._lock.release()
+        livre.append(pegou)
+
+    def espiao(original):
+        def chamada(self, *args, **kwargs):
+            thread = threading.Thread(target=tenta_o_lock)
+            thread.start()
+            thread.join()
+            return original(self, *args, **kwargs)
+        return chamada
+
+    for classe, metodo in ((FakeSpreadsheet, "values_batch_get"), (FakeWorksheet, "get_all_values")):
+        monkeypatch.setattr(classe, metodo, espiao(getattr(classe, metodo)))
+    return livre
+
+
+def test_leituras_no_sheets_nao_seguram_o_lock(planilhas, leituras_sem_lock):
+    alvo = next(iter(varredura('itens')))
+    order_index.refresh('itens')                                # snapshot
+    WriteBatch().update_cells('itens', varredura('itens')[alvo][0], 2, ["Outro"]).commit()
+    order_index.values('itens', alvo)                           # linha relida
+    order_index.rows('itens', alvo, verify=True)                # conferência da chave
+
+    assert len(leituras_sem_lock) >= 3
+    assert all(leituras_sem_lock)
+
+
+def test_escrita_durante_o_snapshot_nao_se_perde(planilhas, monkeypatch):
+    original = FakeSpreadsheet.values_batch_get
+    escritas = []
+
+    def com_escrita_no_meio(self, *args, **kwargs):
+        resposta = original(self, *args, **kwargs)
+        if not escritas:
+            # Outra requisição grava enquanto o snapshot volta da rede
+            escritas.append(WriteBatch().append('itens', [["97", "Concorrente"]]).commit())
+        return resposta
+
+    monkeypatch.setattr(FakeSpreadsheet, "values_batch_get", com_escrita_no_meio)
+    assert indice('itens') == varredura('itens')
+    assert order_index.rows('itens', "97") == [len(linhas('itens'))]
@@ -0,0 +1,58 @@
+import random
+
+from app.services.order_index import order_index
+from app.services.sequence import SequenceAllocator
+from app.services.write_batch import WriteBatch
+
+
+def maior_nr_ped():
+    return max(int(k) for k in order_index.keys('pedidos') if k.isdigit())
+
+
+def criar_pelo_bot(*numeros):
+    """Pedidos gravados fora do contador (como faz o bot)."""
+    WriteBatch().append('pedidos', [["", str(n), "BOT"] for n in numeros]).commit()
+
+
+def test_numeros_seguem_o_maior_nr_ped(planilhas):
+    seq = SequenceAllocator()
+    ultimo = maior_nr_ped()
+    assert list(seq.reserve(3)) == [ultimo + 1, ultimo + 2, ultimo + 3]
+    assert seq.next() == ultimo + 4
+
+
+def test_pula_numero_usado_no_meio_do_intervalo(planilhas):
+    seq = SequenceAllocator()
+    ultimo = maior_nr_ped()
+    seq.next()
+    criar_pelo_bot(ultimo + 3)
+
+    # ultimo + 2 está livre, mas ultimo + 3 não: o intervalo recomeça depois da colisão
+    assert list(seq.reserve(3)) == [ultimo + 4, ultimo + 5, ultimo + 6]
+
+
+def test_pula_varias_colisoes(planilhas):
+    seq = SequenceAllocator()
+    ultimo = maior_nr_ped()
+    seq.next()
+    criar_pelo_bot(ultimo + 2, ultimo + 5, ultimo + 7)
+
+    assert list(seq.reserve(2)) == [ultimo + 3, ultimo + 4]
+    assert list(seq.reserve(2)) == [ultimo + 8, ultimo + 9]
+
+
+def test_reservas_nunca_repetem_numero_usado(planilhas):
+    rnd = random.Random(11)
+    seq = SequenceAllocator()
+    ultimo = maior_nr_ped()
+    seq.next()
+    criar_pelo_bot(*rnd.sample(range(ultimo + 2, ultimo + 60), 15))
+
+    entregues = []
+    for _ in range(10):
+        bloco = list(seq.reserve(rnd.randint(1, 4)))
+        assert bloco == list(range(bloco[0], bloco[-1] + 1))
+        entregues += bloco
+    usados = {int(k) for k in order_index.keys('pedidos') if k.isdigit()}
+    assert not usados & set(entregues)
+    assert len(set(entregues)) == len(entregues)
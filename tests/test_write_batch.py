@@ -0,0 +1,141 @@
+import pytest
+from app.fake_sheets import FakeSpreadsheet, FakeWorksheet
+from app.services.order_index import order_index
+from app.services.write_batch import WriteBatch
+from conftest import linhas
+
+
+@pytest.fixture
+def chamadas(monkeypatch):
+    """Registra as chamadas feitas à planilha: [(método, body)]; em append_rows, body = (aba, linhas, opção)."""
+    registro = []
+    for metodo in ("batch_update", "values_batch_update"):
+        original = getattr(FakeSpreadsheet, metodo)
+
+        def espiao(self, body=None, _metodo=metodo, _original=original):
+            registro.append((_metodo, body))
+            return _original(self, body)
+
+        monkeypatch.setattr(FakeSpreadsheet, metodo, espiao)
+
+    original_append = FakeWorksheet.append_rows
+
+    def append_rows(self, values, value_input_option=None, **kwargs):
+        registro.append(("append_rows", (self.title, values, value_input_option)))
+        return original_append(self, values, value_input_option=value_input_option, **kwargs)
+
+    monkeypatch.setattr(FakeWorksheet, "append_rows", append_rows)
+    return registro
+
+
+@pytest.mark.parametrize("valor", ["R$ 520,00", "320.50", "12%", "1.234,56", "01/02/25", "10:30", "=B2*2", "texto"])
+def test_valores_vao_como_digitados_com_user_entered(planilhas, chamadas, valor):
+    # A interpretação (moeda, porcentagem, data...) fica com o Sheets, como no append_row USER_ENTERED
+    WriteBatch().append('itens', [["99", "Coroa", "1", "", "", valor, "", ""]]).update_cells('itens', 2, 6, [valor]).commit()
+
+    assert [b for m, b in chamadas if m == "append_rows"] == [
+        ("PEDIDOS_ITENS", [["99", "Coroa", "1", "", "", valor, "", ""]], "USER_ENTERED"),
+    ]
+    valores = [b for m, b in chamadas if m == "values_batch_update"]
+    assert len(valores) == 1
+    assert valores[0]["valueInputOption"] == "USER_ENTERED"
+    assert valores[0]["data"][0]["values"] == [[valor]]
+
+
+def test_none_vira_celula_vazia(planilhas, chamadas):
+    WriteBatch().update_cells('pedidos', 2, 13, [None]).commit()
+    body = [b for m, b in chamadas if m == "values_batch_update"][0]
+    assert body["data"][0]["values"] == [[""]]
+
+
+def test_append_entra_apos_a_ultima_linha_e_atualiza_o_indice(planilhas):
+    antes = linhas('itens')
+    resultado = WriteBatch().append('itens', [["99", "Coroa"], ["99", "Placa"]]).commit()
+
+    depois = linhas('itens')
+    assert resultado['itens']['start_row'] == len(antes) + 1
+    assert depois[:len(antes)] == antes
+    assert [r[:2] for r in depois[len(antes):]] == [["99", "Coroa"], ["99", "Placa"]]
+    assert order_index.rows('itens', '99') == [len(antes) + 1, len(antes) + 2]
+
+
+def test_linhas_informadas_valem_para_a_planilha_antes_do_lote(planilhas, chamadas):
+    antes = linhas('itens')
+    alvo = antes[3]            # linha 4
+    WriteBatch().delete_rows('itens', [2]).update_cells('itens', 4, 8, ["alterado"]).commit()
+
+    depois = linhas('itens')
+    # A exclusão vem por último: a linha 4 alterada agora é a 3
+    assert depois[2][:7] == alvo[:7]
+    assert depois[2][7] == "alterado"
+    assert len(depois) == len(antes) - 1
+    assert [m for m, _ in chamadas] == ["values_batch_update", "batch_update"]
+
+
+def test_falha_nos_valores_nao_apaga(planilhas, monkeypatch):
+    antes = linhas('itens')
+
+    def falha(self, body=None):
+        raise RuntimeError("quota")
+
+    monkeypatch.setattr(FakeSpreadsheet, "values_batch_update", falha)
+    lote = WriteBatch().update_cells('itens', 3, 8, ["alterado"]).delete_rows('itens', [2])
+    with pytest.raises(RuntimeError):
+        lote.commit()
+    assert linhas('itens') == antes
+
+
+def test_append_concorrente_entre_as_etapas_nao_e_sobrescrito(planilhas, monkeypatch):
+    order_index.rows('itens', '1')      # índice montado
+    externas = []
+    original_append = FakeWorksheet.append_rows
+    original_batch = FakeSpreadsheet.batch_update
+
+    def externa():
+        if not externas:
+            # append_row de outro processo (bot, tela de status) logo depois da primeira chamada do lote
+            externas.append(["98", "Externo"])
+            original_append(planilhas.sheets['itens'], [["98", "Externo"]])
+
+    def append_rows(self, values, value_input_option=None, **kwargs):
+        resposta = original_append(self, values, value_input_option=value_input_option, **kwargs)
+        externa()
+        return resposta
+
+    def batch_update(self, body):
+        resposta = original_batch(self, body)
+        externa()
+        return resposta
+
+    monkeypatch.setattr(FakeWorksheet, "append_rows", append_rows)
+    monkeypatch.setattr(FakeSpreadsheet, "batch_update", batch_update)
+    antes = linhas('itens')
+    resultado = (WriteBatch()
+                 .append('pedidos', [["", "99", "CLIENTE"]])
+                 .append('itens', [["99", "Coroa"], ["99", "Placa"]])
+                 .update_cells('itens', 2, 8, ["alterado"])
+                 .commit())
+
+    # As linhas do lote entram primeiro; a externa, gravada entre o append e a escrita dos valores, fica intacta
+    depois = linhas('itens')
+    assert depois[1][7] == "alterado"
+    assert depois[2:len(antes)] == antes[2:]
+    assert [r[:2] for r in depois[len(antes):]] == [["99", "Coroa"], ["99", "Placa"], ["98", "Externo"]]
+    assert resultado['itens']['start_row'] == len(antes) + 1
+    assert order_index.rows('itens', '99') == [len(antes) + 1, len(antes) + 2]
+
+
+def test_append_depois_de_linha_gravada_por_fora(planilhas):
+    order_index.rows('itens', '1')      # índice montado
+    # Linha gravada por fora (bot / edição manual), sem avisar o app
+    planilhas.sheets['itens'].spreadsheet._load_worksheet('PEDIDOS_ITENS')._values.append(["98", "Externo"])
+    externa = len(linhas('itens'))
+
+    resultado = WriteBatch().append('itens', [["99", "Coroa"]]).commit()
+
+    depois = linhas('itens')
+    assert resultado['itens']['start_row'] == externa + 1
+    assert depois[externa - 1][:2] == ["98", "Externo"]
+    assert depois[externa][:2] == ["99", "Coroa"]
+    assert order_index.rows('itens', '98') == [externa]
+    assert order_index.rows('itens', '99') == [externa + 1]